@@ -0,0 +1,82 @@
+"""Micro-benchmark of the Markdown-to-Notion conversion.
+
+Compares the single-pass converter against the previous line-by-line
+startswith/regex chain (copied below as the baseline) on a synthetic
+project-plan-sized document.
+
+Usage: python bench_markdown.py [repeats]
+"""
+import re
+import sys
+import timeit
+from markdown_converter import markdown_to_notion_blocks
+from notion_writer import batch_children, text_blocks
+
+
+def legacy_markdown_to_notion_blocks(text):
+    blocks = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('#### '):
+            blocks.extend(text_blocks("heading_3", line[5:]))
+        elif line.startswith('### '):
+            blocks.extend(text_blocks("heading_3", line[4:]))
+        elif line.startswith('## '):
+            blocks.extend(text_blocks("heading_2", line[3:]))
+        elif line.startswith('# '):
+            blocks.extend(text_blocks("heading_1", line[2:]))
+        elif re.match(r'^\*\*[^*]+?\*\*$', line):
+            blocks.extend(text_blocks("heading_3", line[2:-2]))
+        elif line:
+            blocks.extend(text_blocks("paragraph", line))
+    return blocks
+
+
+def legacy_remove_markdown_bold_italic(text):
+    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
+    text = re.sub(r'\*(.*?)\*', r'\1', text)
+    return text
+
+
+def legacy_convert(text):
+    return legacy_markdown_to_notion_blocks(legacy_remove_markdown_bold_italic(text))
+
+
+def synthetic_document(days=40):
+    """A document shaped like generated section text: headings, lists, inline formatting and code."""
+    parts = ["# Project Plan", ""]
+    for day in range(1, days + 1):
+        parts += [
+            f"## Day {day}: Build the **ingestion** pipeline",
+            "**Goals**",
+            f"- Implement the *parser* for batch {day} with `parse_record()`",
+            "- Add retries around the [upload API](https://example.com/docs/upload)",
+            "1. Write unit tests for ***edge cases***",
+            "2. Profile the hot path and document the results",
+            "### Notes",
+            "A paragraph describing the work of the day in some detail, " * 4,
+            "```python",
+            "def parse_record(line):",
+            "    return line.split(',')",
+            "```",
+            "",
+        ]
+    return "\n".join(parts)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    repeats = int(argv[0]) if argv else 50
+    document = synthetic_document()
+    legacy_time = min(timeit.repeat(lambda: legacy_convert(document), number=repeats, repeat=3)) / repeats
+    new_time = min(timeit.repeat(lambda: markdown_to_notion_blocks(document), number=repeats, repeat=3)) / repeats
+    print(f"Document: {len(document):,} characters, {document.count(chr(10)) + 1:,} lines")
+    for name, seconds, blocks in (("Legacy converter", legacy_time, legacy_convert(document)),
+                                  ("Single-pass converter", new_time, markdown_to_notion_blocks(document))):
+        requests = len(batch_children(blocks))
+        print(f"{name + ':':<23}{seconds * 1000:8.2f} ms  ({len(blocks)} blocks, {requests} Notion requests)")
+    print(f"Speedup: {legacy_time / new_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
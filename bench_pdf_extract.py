@@ -0,0 +1,74 @@
+"""Benchmark of PDF text extraction: serial vs. page ranges across worker processes.
+
+Writes synthetic design PDFs of the given page counts and times load_document on
+each with every worker count, then once more with the per-page cache warm. The
+speedup depends on the number of cores: on a single-core host the process pool
+can only add overhead.
+
+Usage: python bench_pdf_extract.py [--pages 50,200,500] [--workers 1,2,4] [--repeats 1]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import document_cache
+from fake_backends import write_synthetic_pdf
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark serial vs. parallel PDF extraction.")
+    parser.add_argument("--pages", default="50,200,500", help="comma-separated page counts")
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}",
+                        help="comma-separated worker process counts (1 = serial)")
+    parser.add_argument("--repeats", type=int, default=1, help="runs per measurement (best is kept)")
+    return parser.parse_args(argv)
+
+
+def best_time(pdf_path, repeats, cache_dir=None):
+    best = None
+    for _ in range(repeats):
+        document_cache.clear_memory_cache()
+        start = time.perf_counter()
+        document = document_cache.load_document(pdf_path, cache_dir=cache_dir)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, document
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="bench-pdf-")
+    worker_counts = sorted({int(w) for w in args.workers.split(",")})
+    print(f"{os.cpu_count()} CPUs")
+    print(f"{'pages':>6}  {'workers':>7}  {'seconds':>8}  {'pages/s':>8}  {'speedup':>7}")
+    try:
+        for pages in (int(p) for p in args.pages.split(",")):
+            pdf_path = os.path.join(workdir, f"{pages:04d}. Synthetic.pdf")
+            write_synthetic_pdf(pdf_path, pages)
+            serial = None
+            reference = None
+            for workers in worker_counts:
+                # A fresh pool per worker count; the first document also pays for starting it
+                document_cache.configure(workers=workers, parallel_min_pages=1)
+                best_time(pdf_path, 1)
+                seconds, document = best_time(pdf_path, args.repeats)
+                reference = reference or document["text"]
+                assert document["text"] == reference, "page order differs between worker counts"
+                serial = serial or seconds
+                print(f"{pages:>6}  {workers:>7}  {seconds:>8.2f}  {pages / seconds:>8.0f}  {serial / seconds:>6.1f}x")
+            cache_dir = os.path.join(workdir, "cache")
+            document_cache.clear_memory_cache()
+            document_cache.load_document(pdf_path, cache_dir=cache_dir)
+            # Only the per-page cache is kept, as when a cap is raised or an extraction was interrupted
+            for name in os.listdir(cache_dir):
+                if not name.endswith(".pages.json"):
+                    os.remove(os.path.join(cache_dir, name))
+            seconds, _ = best_time(pdf_path, args.repeats, cache_dir=cache_dir)
+            print(f"{pages:>6}  {'cached':>7}  {seconds:>8.2f}  {pages / seconds:>8.0f}  {serial / seconds:>6.1f}x")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Offline end-to-end benchmark of the bot against fake Gemini, Claude and Notion backends.
+
+Writes synthetic design PDFs of the given page counts, runs bot.main over them
+with the fakes from fake_backends installed, and reports projects/hour, API calls
+and retries per project and peak Python memory. Use --output to append the result
+to a JSON-lines file and compare runs.
+
+Usage: python bench_pipeline.py --projects 4 --pages 5,50,200 --llm-latency 0.2 --rate-limit-rate 0.02
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline offline against fake API backends.")
+    parser.add_argument("--projects", type=int, default=3, help="number of synthetic projects (PDFs)")
+    parser.add_argument("--pages", default="5,50,200", help="comma-separated page counts, cycled over the projects")
+    parser.add_argument("--concurrency", type=int, default=1, help="projects processed at a time (--projects of bot)")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="mean seconds per fake LLM call")
+    parser.add_argument("--notion-latency", type=float, default=0.02, help="mean seconds per fake Notion request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls failing with a 5xx")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of calls failing with a 429")
+    parser.add_argument("--response-chars", type=int, default=3000, help="size of a fake page-length response")
+    parser.add_argument("--notion-rate", type=float, default=100.0,
+                        help="Notion requests per second allowed by the client-side limiter")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="append the result as one JSON line to this file")
+    parser.add_argument("bot_args", nargs=argparse.REMAINDER,
+                        help="extra bot.py options after --, e.g. -- --stream --daily-batch-size 5")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="bench-pipeline-")
+    pdf_dir = os.path.join(workdir, "pdfs")
+    os.makedirs(pdf_dir)
+    # Journals, reports and datasets of the benchmark stay in its scratch directory
+    os.environ['RUN_JOURNAL_DIR'] = os.path.join(workdir, "runs")
+    os.environ['LLM_CACHE_PATH'] = os.path.join(workdir, "llm_cache.sqlite3")
+
+    import fake_backends
+    import instrumentation
+    import bot
+
+    page_counts = [int(p) for p in args.pages.split(",")]
+    for i in range(args.projects):
+        pages = page_counts[i % len(page_counts)]
+        fake_backends.write_synthetic_pdf(
+            os.path.join(pdf_dir, f"{i + 1:02d}. Synthetic Project {i + 1}.pdf"), pages,
+            title=f"Synthetic Project {i + 1}",
+        )
+    config = fake_backends.FakeConfig(
+        llm_latency=args.llm_latency, notion_latency=args.notion_latency, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, response_chars=args.response_chars, seed=args.seed,
+    )
+    fake_backends.install(config)
+
+    bot_args = [pdf_dir, "--projects", str(args.concurrency), "--no-llm-cache", "--restart",
+                "--notion-rate", str(args.notion_rate), "--report", os.path.join(workdir, "report.json")]
+    bot_args += [a for a in args.bot_args if a != "--"]
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        exit_code = bot.main(bot_args)
+    finally:
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        os.chdir(cwd)
+
+    by_kind = {row["kind"]: row for row in instrumentation.summarize(by=("kind",))}
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "projects": args.projects,
+        "pages": page_counts,
+        "concurrency": args.concurrency,
+        "bot_args": bot_args[1:],
+        "exit_code": exit_code,
+        "seconds": round(elapsed, 2),
+        "projects_per_hour": round(args.projects * 3600 / elapsed, 1),
+        "peak_memory_mb": round(peak / 2 ** 20, 1),
+        "calls_per_project": {kind: round(row["calls"] / args.projects, 1) for kind, row in by_kind.items()},
+        "retries_per_project": {kind: round(row["retries"] / args.projects, 1) for kind, row in by_kind.items()},
+        "p50_s": {kind: row["p50_s"] for kind, row in by_kind.items()},
+        "p95_s": {kind: row["p95_s"] for kind, row in by_kind.items()},
+        "fake_requests": dict(config.calls),
+    }
+    print("\n=== Pipeline benchmark ===")
+    print(f"{args.projects} projects ({args.pages} pages) in {elapsed:.1f}s: "
+          f"{result['projects_per_hour']} projects/hour, peak memory {result['peak_memory_mb']} MB")
+    for kind, row in sorted(by_kind.items()):
+        print(f"  {kind:<7} {result['calls_per_project'][kind]:>7} calls/project  "
+              f"{result['retries_per_project'][kind]:>5} retries/project  "
+              f"p50 {row['p50_s']:.3f}s  p95 {row['p95_s']:.3f}s")
+    caches = {name: config.calls.get(f"{name}_context_caches", 0) for name in ("gemini", "claude")}
+    reads = {name: config.calls.get(f"{name}_context_reads", 0) for name in ("gemini", "claude")}
+    print("  context caches: " + ", ".join(
+        f"{name} {caches[name] / args.projects:.1f} created / {reads[name] / args.projects:.1f} reads per project"
+        for name in caches))
+    print(f"Scratch directory: {workdir}")
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
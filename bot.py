@@ -1,4 +1,3 @@
-from notion_client import Client
 import os
 from dotenv import load_dotenv
 from content_generator import (
@@ -7,19 +6,64 @@ from content_generator import (
     generate_work_overview,
     generate_project_plan,
     generate_daily_content,
-    check_dataset_required,
-    generate_dataset,
+    generate_daily_content_batch,
+    stream_section,
+    estimate_tokens,
+    plan_dataset,
+    set_condensation,
+    set_separate_dataset_check,
+    GenerationError,
+    _generated,
 )
+from document_cache import load_document
+from markdown_converter import MarkdownConverter, markdown_to_notion_blocks
+from job_queue import JobQueue, file_hash
+from run_journal import open_journal
+import document_cache
+import instrumentation
+import llm_cache
+import llm_providers
+import notion_sync
+import notion_writer
+from instrumentation import ContextThreadPoolExecutor, log
+from notion_writer import LazyClient, ThrottledClient, archive_page, create_page, rich_text, text_blocks, write_streamed_page
 import re
+import csv
+import io
 import glob
+import sys
+import time
+import threading
+import argparse
+from concurrent.futures import Future, as_completed
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Notion client
-notion = Client(auth=os.getenv('NOTION_TOKEN'))
+def notion_client():
+    from notion_client import Client
+    return Client(auth=os.getenv('NOTION_TOKEN'))
+
+# Notion client, built on its first request; every call goes through the shared rate limiter
+notion = ThrottledClient(LazyClient(notion_client))
 parent_page_id = os.getenv('NOTION_PARENT_PAGE_ID')
 
+# Number of days whose content is generated concurrently
+DAILY_WORKERS = int(os.getenv('DAILY_WORKERS', '8'))
+# Day pages created concurrently under the Project Plan page. 1 (the default) creates
+# them one after another so Notion lists them in Day 1..40 order.
+DAY_PAGE_WORKERS = int(os.getenv('DAY_PAGE_WORKERS', '1'))
+# Stream section text into Notion while it is being generated
+STREAM_SECTIONS = os.getenv('STREAM_SECTIONS', '').lower() in ('1', 'true', 'yes')
+# Days requested per structured LLM call (1 = one call per day)
+DAILY_BATCH_SIZE = int(os.getenv('DAILY_BATCH_SIZE', '10'))
+# Update the existing project pages in place, sending only changed blocks
+SYNC_PAGES = os.getenv('NOTION_SYNC', '').lower() in ('1', 'true', 'yes')
+DAYS = 40
+# Watch mode: seconds between folder scans, and queued jobs above which new files wait
+WATCH_INTERVAL = float(os.getenv('WATCH_INTERVAL', '5'))
+WATCH_MAX_QUEUED = int(os.getenv('WATCH_MAX_QUEUED', '20'))
+
 def extract_title_from_pdf(filename):
     """Extract title from PDF filename: take everything after the first number and nothing before."""
     # Get just the filename, not the full path
@@ -36,87 +80,11 @@ def extract_title_from_pdf(filename):
     else:
         return name
 
-def split_text_blocks(text, max_length=2000):
-    """Split text into chunks of max_length, breaking at newlines if possible."""
-    blocks = []
-    while len(text) > max_length:
-        split_at = text.rfind('\n', 0, max_length)
-        if split_at == -1 or split_at < max_length // 2:
-            split_at = max_length
-        blocks.append(text[:split_at])
-        text = text[split_at:]
-    if text:
-        blocks.append(text)
-    return blocks
-
-def markdown_to_notion_blocks(text):
-    blocks = []
-    for line in text.splitlines():
-        line = line.strip()
-        if line.startswith('#### '):
-            blocks.append({
-                "object": "block",
-                "type": "heading_3",
-                "heading_3": {
-                    "rich_text": [{"type": "text", "text": {"content": line[5:]}}]
-                }
-            })
-        elif line.startswith('### '):
-            blocks.append({
-                "object": "block",
-                "type": "heading_3",
-                "heading_3": {
-                    "rich_text": [{"type": "text", "text": {"content": line[4:]}}]
-                }
-            })
-        elif line.startswith('## '):
-            blocks.append({
-                "object": "block",
-                "type": "heading_2",
-                "heading_2": {
-                    "rich_text": [{"type": "text", "text": {"content": line[3:]}}]
-                }
-            })
-        elif line.startswith('# '):
-            blocks.append({
-                "object": "block",
-                "type": "heading_1",
-                "heading_1": {
-                    "rich_text": [{"type": "text", "text": {"content": line[2:]}}]
-                }
-            })
-        elif re.match(r'^\*\*[^*]+?\*\*$', line):
-            blocks.append({
-                "object": "block",
-                "type": "heading_3",
-                "heading_3": {
-                    "rich_text": [{"type": "text", "text": {"content": line[2:-2]}}]
-                }
-            })
-        elif line:
-            blocks.append({
-                "object": "block",
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [{"type": "text", "text": {"content": line}}]
-                }
-            })
-    return blocks
-
-def remove_markdown_bold_italic(text):
-    # Remove all **bold** and *italic* markers
-    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
-    text = re.sub(r'\*(.*?)\*', r'\1', text)
-    return text
+def create_page_with_content(parent_id, title, content, image_url=None, pdf_url=None, image_caption=None, on_created=None):
+    """Create a page with title, content, and optionally images from Imgur URLs.
 
-def create_page_with_content(parent_id, title, content, image_url=None, pdf_url=None, image_caption=None):
-    """Create a page with title, content, and optionally images from Imgur URLs."""
-    page = notion.pages.create(
-        parent={"page_id": parent_id},
-        properties={
-            "title": [{"type": "text", "text": {"content": title}}]
-        }
-    )
+    on_created, if given, is called with the new page ID as soon as the page exists.
+    """
     children = []
 
     # Add image if provided
@@ -130,13 +98,7 @@ def create_page_with_content(parent_id, title, content, image_url=None, pdf_url=
             }
         })
         if image_caption:
-            children.append({
-                "object": "block",
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [{"type": "text", "text": {"content": image_caption}}]
-                }
-            })
+            children.extend(text_blocks("paragraph", image_caption))
 
     # Add PDF link if provided
     if pdf_url:
@@ -144,130 +106,626 @@ def create_page_with_content(parent_id, title, content, image_url=None, pdf_url=
             "object": "block",
             "type": "paragraph",
             "paragraph": {
-                "rich_text": [
-                    {
-                        "type": "text",
-                        "text": {"content": "📄 Design Document: "},
-                        "annotations": {"bold": True}
-                    },
-                    {
-                        "type": "text",
-                        "text": {"content": "View PDF"},
-                        "annotations": {"color": "blue"},
-                        "href": pdf_url
-                    }
-                ]
+                "rich_text": (
+                    rich_text("📄 Design Document: ", annotations={"bold": True})
+                    + rich_text("View PDF", annotations={"color": "blue"}, href=pdf_url)
+                )
             }
         })
 
-    # Remove Markdown bold/italic before converting to Notion blocks
-    content = remove_markdown_bold_italic(content)
+    children.extend(markdown_to_notion_blocks(content))
+
+    return create_page(notion, parent_id, title, children, on_created=on_created)
+
+def write_stage_page(journal, stage, parent_id, title, content):
+    """Create the page of a journaled stage, reusing it if an earlier run already wrote it."""
+    entry = journal.get(stage)
+    if entry.get("complete"):
+        return entry["page_id"]
+    if SYNC_PAGES:
+        return sync_stage_page(journal, stage, parent_id, title, content)
+    with instrumentation.stage(stage):
+        # A page an interrupted run created but never finished filling is replaced, not duplicated
+        if entry.get("page_id"):
+            archive_page(notion, entry["page_id"])
+        page_id = create_page_with_content(
+            parent_id, title, content,
+            on_created=lambda new_page_id: journal.record(stage, page_id=new_page_id),
+        )
+    journal.record(stage, blocks_hash=notion_sync.blocks_hash(markdown_to_notion_blocks(content)), complete=True)
+    return page_id
+
+def sync_stage_page(journal, stage, parent_id, title, content):
+    """Bring the existing page of a stage up to date with content, creating it only if missing."""
+    entry = journal.get(stage)
     blocks = markdown_to_notion_blocks(content)
-    children.extend(blocks)
+    digest = notion_sync.blocks_hash(blocks)
+    with instrumentation.stage(stage):
+        page_id = entry.get("page_id") or notion_sync.find_child_page(notion, parent_id, title)
+        if page_id is None:
+            page_id = create_page(notion, parent_id, title, blocks,
+                                  on_created=lambda new_page_id: journal.record(stage, page_id=new_page_id))
+            notion_sync.remember_child_page(parent_id, title, page_id)
+        # Unchanged since the last sync: the page is not touched; otherwise only changed blocks are sent
+        elif digest != entry.get("blocks_hash"):
+            changes = notion_sync.sync_blocks(notion, page_id, blocks)
+            if any(changes.values()):
+                log(f"🔄 {title}: {changes['updated']} blocks updated, {changes['deleted']} deleted, "
+                    f"{changes['inserted']} inserted", **changes)
+    journal.record(stage, page_id=page_id, blocks_hash=digest, complete=True)
+    return page_id
+
+def stream_stage_page(journal, stage, parent_id, title, chunks):
+    """Write a journaled stage's page while its text streams in, then record the full text."""
+    with journal.stage_lock(stage), instrumentation.stage(stage):
+        entry = journal.get(stage)
+        if entry.get("text") is not None:
+            return write_stage_page(journal, stage, parent_id, title, entry["text"])
+        if entry.get("page_id"):
+            archive_page(notion, entry["page_id"])
+        page_id, text = write_streamed_page(
+            notion, parent_id, title, chunks(), MarkdownConverter(),
+            on_created=lambda new_page_id: journal.record(stage, page_id=new_page_id),
+        )
+        journal.record(stage, text=_generated(text, title), complete=True)
+    return page_id
+
+def generate_stage_text(journal, stage, generate, *args):
+    """Return the journaled text of a stage, generating and recording it only if missing."""
+    # Concurrent callers for the same stage wait for the first one instead of generating twice
+    with journal.stage_lock(stage):
+        text = journal.get(stage).get("text")
+        if text is None:
+            with instrumentation.stage(stage):
+                text = generate(*args)
+            journal.record(stage, text=text)
+    return text
+
+def engineering_text(document):
+    """Generate the engineering design and flatten it into the text of its page."""
+    eng_result = generate_engineering(document)
+    return eng_result["schema"] + "\n\n" + eng_result["component_explanations"]
+
+# Section pages created under the main project page. None of them depends on
+# another section's output, so their LLM calls are all launched at once.
+SECTIONS = [
+    ("background", "Background Information", generate_background),
+    ("engineering", "Engineering Design", engineering_text),
+    ("work_overview", "Work Overview", generate_work_overview),
+    ("project_plan", "Project Plan", lambda document: generate_project_plan()),
+]
+
+def _write_section(journal, key, title, generate, main_page, document, stream):
+    stage = f"section:{key}"
+    if stream and not SYNC_PAGES and not journal.is_complete(stage):
+        return stream_stage_page(journal, stage, main_page, title, lambda: stream_section(key, document))
+    return write_stage_page(journal, stage, main_page, title, generate_stage_text(journal, stage, generate, document))
+
+def run_section_pipeline(journal, main_page, document, dependents=None, stream=None):
+    """Generate every section concurrently and create each page as soon as its content arrives.
 
-    notion.blocks.children.append(
-        block_id=page["id"],
-        children=children
+    dependents maps a section key to a callable taking its page ID. Returns the page ID per section.
+    """
+    stream = STREAM_SECTIONS if stream is None else stream
+    dependents = dependents or {}
+    pages = {}
+    with ContextThreadPoolExecutor(max_workers=len(SECTIONS) + len(dependents)) as pool:
+        pending = {}
+        for key, title, generate in SECTIONS:
+            if not journal.is_complete(f"section:{key}"):
+                log(f"📄 Generating {title}...", section=key)
+            future = pool.submit(_write_section, journal, key, title, generate, main_page, document, stream)
+            pending[future] = (key, title)
+        follow_ups = []
+        # A section that fails does not stop the others; the first error is raised at the end
+        errors = []
+        for future in as_completed(pending):
+            key, title = pending[future]
+            try:
+                pages[key] = future.result()
+            except Exception as e:
+                errors.append(e)
+                continue
+            log(f"✅ {title} updated", section=key)
+            if key in dependents:
+                follow_ups.append(pool.submit(dependents[key], pages[key]))
+        for future in follow_ups:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(e)
+    if errors:
+        raise errors[0]
+    return pages
+
+def _resolve(value):
+    """The dataset headers may still be generating: wait for them if given as a future."""
+    return value.result() if isinstance(value, Future) else value
+
+def _timed_daily_content(journal, day, headers):
+    start = time.perf_counter()
+    content = generate_stage_text(
+        journal, f"day:{day}", lambda: generate_daily_content(day, _resolve(headers))
     )
-    return page["id"]
+    return content, time.perf_counter() - start
 
-def main():
+def _generate_daily_batch(journal, batch, headers, day_futures, plan=None):
+    start = time.perf_counter()
     try:
-        # Get folder path from user input
-        folder_path = input("Enter the folder path containing PDFs: ").strip().strip('"\'')
-        
-        # Check if folder exists
-        if not os.path.exists(folder_path):
-            print(f"❌ Error: Folder not found: {folder_path}")
-            return
-        
-        # Find all PDF files in the folder
-        pdf_pattern = os.path.join(folder_path, "*.pdf")
-        pdf_files = glob.glob(pdf_pattern)
-        
-        if not pdf_files:
-            print(f"❌ No PDF files found in: {folder_path}")
-            return
-        
-        print(f"🚀 Found {len(pdf_files)} PDF files to process")
-        
-        # Process each PDF file
-        for i, pdf_path in enumerate(pdf_files, 1):
-            print(f"\n--- Processing {i}/{len(pdf_files)}: {os.path.basename(pdf_path)} ---")
-            
-            # Check if PDF exists
-            if not os.path.exists(pdf_path):
-                print(f"❌ Error: PDF not found: {pdf_path}")
+        # Batched days follow the Project Plan, so wait for (or generate) its text first
+        if plan is not None:
+            plan = _resolve(plan)
+        else:
+            plan = generate_stage_text(journal, "section:project_plan", generate_project_plan)
+        with instrumentation.stage(f"day:{batch[0]}"):
+            contents = generate_daily_content_batch(batch[0], batch[-1], headers=_resolve(headers), plan=plan)
+        for day in batch:
+            journal.record(f"day:{day}", text=contents[day])
+            day_futures[day - 1].set_result((contents[day], time.perf_counter() - start))
+    except Exception as e:
+        for day in batch:
+            if not day_futures[day - 1].done():
+                day_futures[day - 1].set_exception(e)
+
+def _daily_batches(journal, days, batch_size):
+    """Group the days without journaled text into contiguous runs of at most batch_size days."""
+    batches = []
+    for day in range(1, days + 1):
+        if journal.get(f"day:{day}").get("text") is not None:
+            continue
+        if batches and batches[-1][-1] == day - 1 and len(batches[-1]) < batch_size:
+            batches[-1].append(day)
+        else:
+            batches.append([day])
+    return batches
+
+def start_daily_generation(pool, journal, dataset_headers=None, days=DAYS, batch_size=None, plan=None):
+    """Submit the generation of Day 1..days to pool; returns one future per day, in order.
+
+    dataset_headers and plan (the Project Plan's text) may be futures.
+    """
+    batch_size = batch_size or DAILY_BATCH_SIZE
+    # Journaled days resolve without an LLM call; the others are requested a batch per structured call
+    if batch_size <= 1:
+        return [pool.submit(_timed_daily_content, journal, day, dataset_headers) for day in range(1, days + 1)]
+    day_futures = [Future() for _ in range(days)]
+    for day in range(1, days + 1):
+        text = journal.get(f"day:{day}").get("text")
+        if text is not None:
+            day_futures[day - 1].set_result((text, 0.0))
+    for batch in _daily_batches(journal, days, batch_size):
+        pool.submit(_generate_daily_batch, journal, batch, dataset_headers, day_futures, plan)
+    return day_futures
+
+def write_daily_pages(journal, plan_page, futures, workers=None):
+    """Create the Day pages under plan_page as each day's content becomes available; returns the latency per day."""
+    latencies = {}
+    written = {}
+    errors = []
+    start = time.perf_counter()
+    # Notion lists child pages in the order it finished creating them, so with more than one
+    # worker neighbouring days can swap places
+    with ContextThreadPoolExecutor(max_workers=workers or DAY_PAGE_WORKERS) as pool:
+        for day, future in enumerate(futures, 1):
+            # A day that failed is left for the rerun; the days after it are still written
+            try:
+                content, latencies[day] = future.result()
+            except Exception as e:
+                errors.append(e)
+                continue
+            written[day] = pool.submit(write_stage_page, journal, f"day:{day}", plan_page, f"Day {day}", content)
+        for day, page in written.items():
+            try:
+                page.result()
+            except Exception as e:
+                errors.append(e)
                 continue
+            log(f"  Day {day} created (generated in {latencies[day]:.1f}s)", end='\r',
+                day=day, generation_s=round(latencies[day], 2))
+    log("")
+    if errors:
+        log(f"❌ {len(errors)} Day pages could not be written: {str(errors[0])}", level="error", failed=len(errors))
+        raise errors[0]
+    values = sorted(latencies.values())
+    log(f"  Daily latency: min {values[0]:.1f}s, median {values[len(values) // 2]:.1f}s, "
+        f"max {values[-1]:.1f}s", min_s=round(values[0], 2), max_s=round(values[-1], 2),
+        p50_s=round(instrumentation.percentile(values, 0.5), 2),
+        p95_s=round(instrumentation.percentile(values, 0.95), 2))
+    log(f"✅ All daily content updated ({time.perf_counter() - start:.1f}s)",
+        seconds=round(time.perf_counter() - start, 2))
+    return latencies
 
-            # print("🚀 Starting content generation and Notion update...")
-            
-            # Extract project title first (needed for dataset filename)
-            project_title = extract_title_from_pdf(pdf_path)
-            print(f"📝 Project: {project_title}")
-            
-            ## Step 0: Check if dataset is required and get headers if needed
-            dataset_headers = None
-            if check_dataset_required(pdf_path):
-                print("Yes, dataset is required.")
-                csv_path = generate_dataset(pdf_path, project_title=project_title)
-                with open(csv_path, 'r', encoding='utf-8') as f:
-                    dataset_headers = f.readline().strip()
-                print("Dataset headers:", dataset_headers)
-            else:
-                print("No, dataset is required.")
-            
-            # Create main project page
-            print(f"📝 Creating main project page: {project_title}")
-            main_page = create_page_with_content(parent_page_id, project_title, f"Project: {project_title}")
-            
-            # Generate and update background
-            print("📄 Generating Background Information...")
-            background_content = generate_background(pdf_path)
-            create_page_with_content(main_page, "Background Information", background_content)
-            print("✅ Background Information updated")
-            
-            # Generate and update engineering design
-            print("📄 Generating Engineering Design...")
-            eng_result = generate_engineering(pdf_path)
-            if "error" in eng_result:
-                print(f"❌ Error in engineering design: {eng_result['error']}")
-                create_page_with_content(main_page, "Engineering Design", "Error generating engineering content")
-            else:
-                eng_text = eng_result["schema"] + "\n\n" + eng_result["component_explanations"]
-                create_page_with_content(
-                    main_page, 
-                    "Engineering Design", 
-                    eng_text
-                )
-            print("✅ Engineering Design updated")
-            
-            # Generate and update work overview
-            print("📄 Generating Work Overview...")
-            work_content = generate_work_overview(pdf_path)
-            create_page_with_content(main_page, "Work Overview", work_content)
-            print("✅ Work Overview updated")
-            
-            #Generate and update project plan
-            print("📄 Generating Project Plan...")
-            plan_content = generate_project_plan()
-            plan_page = create_page_with_content(main_page, "Project Plan", plan_content)
-            print("✅ Project Plan updated")
-            
-            #Generate and update all daily content
-            print("📅 Generating daily content...")
-            for day in range(1, 41):
-                print(f"  Generating Day {day}...", end='\r')
-                content = generate_daily_content(day, headers=dataset_headers)
-                create_page_with_content(plan_page, f"Day {day}", content)
-            print("\n✅ All daily content updated")
-            
-            print(f"✅ Successfully processed: {project_title}")
-        
-        print("🎉 All content has been generated and updated to Notion!")
-        
+def dataset_stage(journal, document, project_title):
+    """Decide whether the project needs a dataset and generate it; returns the header line (or None)."""
+    dataset = journal.get("dataset")
+    if not dataset.get("complete"):
+        with instrumentation.stage("dataset"):
+            result = plan_dataset(document, project_title=project_title)
+        dataset = {"required": result["required"], "headers": None}
+        if result["required"]:
+            log("Yes, dataset is required.", dataset_required=True)
+            # Quoted as a CSV row, so column names with commas or quotes read back intact
+            line = io.StringIO()
+            csv.writer(line, lineterminator="").writerow(result["headers"])
+            dataset["headers"] = line.getvalue()
+            dataset["csv_path"] = result["csv_path"]
+        else:
+            log("No, dataset is required.", dataset_required=False)
+        journal.record("dataset", complete=True, **dataset)
+    if dataset["headers"]:
+        log(f"Dataset headers: {dataset['headers']}", headers=dataset["headers"])
+    return dataset["headers"]
+
+def process_project(pdf_path, restart=False):
+    """Generate every page of one project from its design PDF and write it to Notion.
+
+    A rerun resumes from the project's run journal; restart=True starts over.
+    """
+    # Extract project title first (needed for dataset filename)
+    project_title = extract_title_from_pdf(pdf_path)
+    log(f"📝 Project: {project_title}")
+
+    # Parse the PDF once; every generator below works from this document
+    with instrumentation.stage("read_pdf"):
+        document = load_document(pdf_path)
+    journal = open_journal(pdf_path, project_title, document, restart=restart)
+    if SYNC_PAGES:
+        journal.forget_text()
+    done = journal.completed_stages()
+    if done:
+        log(f"↩️ Resuming {project_title}: {len(done)} stages already completed", completed_stages=len(done))
+
+    # Generate every section at once. The dataset decision runs alongside the main
+    # page and the sections; only the daily content waits for its headers, and the
+    # day pages are written as soon as the Project Plan page exists.
+    with ContextThreadPoolExecutor(max_workers=DAILY_WORKERS) as daily_pool:
+        dataset_headers = daily_pool.submit(dataset_stage, journal, document, project_title)
+
+        # Create main project page
+        log(f"📝 Creating main project page: {project_title}")
+        main_page = write_stage_page(journal, "main_page", parent_page_id, project_title, f"Project: {project_title}")
+
+        log("📅 Generating daily content...")
+        # When sections are streamed, the daily batches wait for the streamed Project Plan
+        # instead of generating it first, which would leave nothing to stream
+        plan = Future() if STREAM_SECTIONS and not SYNC_PAGES else None
+        daily_futures = start_daily_generation(daily_pool, journal, dataset_headers, plan=plan)
+
+        def write_days(plan_page):
+            if plan is not None:
+                plan.set_result(journal.get("section:project_plan")["text"])
+            return write_daily_pages(journal, plan_page, daily_futures)
+
+        try:
+            run_section_pipeline(journal, main_page, document, dependents={"project_plan": write_days})
+        finally:
+            if plan is not None and not plan.done():
+                plan.set_exception(GenerationError("The Project Plan could not be generated"))
+        dataset_headers.result()
+
+    log(f"✅ Successfully processed: {project_title}")
+    return project_title
+
+def _run_project(pdf_path, restart=False):
+    start = time.perf_counter()
+    result = {"title": extract_title_from_pdf(pdf_path), "pdf": pdf_path, "error": None}
+    with instrumentation.project(result["title"]):
+        result["run"] = instrumentation.current_run()
+        try:
+            process_project(pdf_path, restart=restart)
+        except Exception as e:
+            result["error"] = str(e)
+            log(f"❌ {os.path.basename(pdf_path)} failed: {str(e)}", level="error")
+        result["seconds"] = time.perf_counter() - start
+    result["notion_calls"] = sum(1 for e in instrumentation.events()
+                                 if e["run"] == result["run"] and e["kind"] == "notion")
+    return result
+
+def run_batch(pdf_files, projects=1, restart=False):
+    """Process several projects concurrently; returns one result dict per PDF, in input order."""
+    with ContextThreadPoolExecutor(max_workers=max(1, projects)) as pool:
+        return list(pool.map(lambda pdf_path: _run_project(pdf_path, restart=restart), pdf_files))
+
+def plan_project(pdf_path, restart=False):
+    """Work plan of one PDF: its title and size, and the stages a run would still have to do."""
+    project_title = extract_title_from_pdf(pdf_path)
+    document = load_document(pdf_path)
+    stages = ["dataset", "main_page"] + [f"section:{key}" for key, _, _ in SECTIONS]
+    stages += [f"day:{day}" for day in range(1, DAYS + 1)]
+    done = set() if restart else set(open_journal(pdf_path, project_title, document).completed_stages())
+    if SYNC_PAGES:
+        # A sync run regenerates and checks every page; only the dataset is kept
+        done &= {"dataset"}
+    pending = [name for name in stages if name not in done]
+    return {"title": project_title, "pdf": pdf_path, "pages": len(document["pages"]),
+            "tokens": estimate_tokens(document["text"]), "done": len(stages) - len(pending), "pending": pending}
+
+def print_plan(plans):
+    """Print what a run would do for each project (the --dry-run output)."""
+    mode = "sync existing pages" if SYNC_PAGES else "create pages"
+    for plan in plans:
+        sections = [name.split(":", 1)[1] for name in plan["pending"] if name.startswith("section:")]
+        days = sum(1 for name in plan["pending"] if name.startswith("day:"))
+        log(f"📝 {plan['title']} ({os.path.basename(plan['pdf'])}): {plan['pages']} pages, ~{plan['tokens']} tokens",
+            **plan)
+        if not plan["pending"]:
+            log("  nothing to do, every stage is complete")
+            continue
+        steps = [name for name in ("dataset", "main_page") if name in plan["pending"]]
+        steps += [f"sections {', '.join(sections)}"] if sections else []
+        steps += [f"{days} days in batches of {DAILY_BATCH_SIZE}"] if days else []
+        resume = f", resuming after {plan['done']} completed stages" if plan["done"] else ""
+        log(f"  {mode}: {'; '.join(steps)}{resume}")
+    pending = sum(len(plan["pending"]) for plan in plans)
+    log(f"🧾 Dry run: {pending} stages to run across {len(plans)} projects; nothing was generated or written",
+        stages=pending, projects=len(plans))
+
+def scan_folder(folder_path, queue, seen, max_queued=None):
+    """Queue the PDFs in folder_path that are new or changed; returns the number of jobs added.
+
+    seen maps each path to its last (mtime, size) and content hash.
+    """
+    max_queued = max_queued or WATCH_MAX_QUEUED
+    added = 0
+    for pdf_path in sorted(glob.glob(os.path.join(folder_path, "*.pdf"))):
+        try:
+            stat = os.stat(pdf_path)
+        except OSError:
+            continue
+        signature = (stat.st_mtime_ns, stat.st_size)
+        previous = seen.get(pdf_path)
+        # Only files unchanged since the last scan are queued, so half-copied files are never picked up
+        if previous is None or previous[0] != signature:
+            seen[pdf_path] = (signature, None)
+            continue
+        if previous[1] is not None:
+            continue
+        # Files past the queue limit wait on disk for a later scan
+        if queue.counts().get("queued", 0) >= max_queued:
+            break
+        content_hash = file_hash(pdf_path)
+        seen[pdf_path] = (signature, content_hash)
+        if queue.enqueue(pdf_path, content_hash, title=extract_title_from_pdf(pdf_path)):
+            added += 1
+            log(f"📥 Queued {os.path.basename(pdf_path)}", pdf=pdf_path, job=content_hash[:12])
+    return added
+
+def _run_job(queue, job):
+    start = time.perf_counter()
+    result = {"title": os.path.basename(job["path"]), "error": None}
+    report = None
+    try:
+        result = _run_project(job["path"])
+        report = os.path.join(os.path.dirname(queue.path), "reports", f"{job['hash'][:12]}.json")
+        instrumentation.write_report(report, extra=dict(result, job=job["hash"], attempt=job["attempts"]),
+                                     recorded=instrumentation.pop_events(result["run"]))
     except Exception as e:
-        print(f"❌ An error occurred: {str(e)}")
+        result["error"] = result["error"] or str(e)
+        log(f"❌ {result['title']}: {str(e)}", level="error", job=job["hash"][:12])
+    finally:
+        # Always settle the job, so it is never left running until the next restart
+        document_cache.clear_memory_cache()
+        seconds = round(time.perf_counter() - start, 2)
+        status = queue.finish(job["hash"], error=result["error"], seconds=seconds, report=report)
+    log(f"{'✅' if status == 'done' else '❌'} {result['title']}: {status} after {seconds:.1f}s",
+        job=job["hash"][:12], status=status, seconds=seconds)
+
+def _watch_worker(queue, stop):
+    # Workers only claim a job when they are free, so at most one project per worker is in flight
+    while not stop.is_set():
+        job = queue.claim()
+        if job is None:
+            stop.wait(1.0)
+            continue
+        try:
+            _run_job(queue, job)
+        except Exception as e:
+            log(f"❌ Could not record job {job['hash'][:12]}: {str(e)}", level="error")
+
+def watch_folder(folder_path, workers=1, interval=None, stop=None):
+    """Process PDFs dropped into folder_path with `workers` projects at a time until stopped (Ctrl-C or stop.set())."""
+    interval = interval or WATCH_INTERVAL
+    queue = JobQueue()
+    recovered = queue.recover()
+    if recovered:
+        log(f"↩️ Requeued {recovered} jobs interrupted by the last shutdown", recovered=recovered)
+    stop = stop or threading.Event()
+    threads = [
+        threading.Thread(target=_watch_worker, args=(queue, stop), name=f"watch-worker-{i + 1}", daemon=True)
+        for i in range(max(1, workers))
+    ]
+    for thread in threads:
+        thread.start()
+    log(f"👀 Watching {folder_path} every {interval:g}s with {len(threads)} workers (queue: {queue.path})",
+        folder=folder_path, workers=len(threads), queue=queue.path)
+    seen = {}
+    try:
+        while not stop.is_set():
+            scan_folder(folder_path, queue, seen)
+            stop.wait(interval)
+    except KeyboardInterrupt:
+        log("⏹️ Stopping after the running jobs (Ctrl-C again to quit now; they resume on the next start)")
+        stop.set()
+    for thread in threads:
+        thread.join()
+    queue.close()
+    return 0
+
+def print_status(limit=20):
+    """Print the job counts per status and the most recent jobs of the watch queue."""
+    queue = JobQueue()
+    counts = queue.counts()
+    jobs = queue.recent(limit)
+    queue.close()
+    if instrumentation.LOG_FORMAT == "json":
+        log("job status", queue=queue.path, counts=counts, jobs=jobs)
+        return
+    order = ("queued", "running", "done", "failed", "superseded")
+    print(f"Jobs in {queue.path}: " + ", ".join(f"{counts.get(status, 0)} {status}" for status in order))
+    if not jobs:
+        return
+    width = max([len("Project")] + [len(job["title"] or "") for job in jobs])
+    print(f"\n{'Status':<10}  {'Project':<{width}}  {'Tries':>5}  {'Time':>8}  {'Updated':<19}  Error")
+    for job in jobs:
+        updated = job["finished_at"] or job["started_at"] or job["enqueued_at"]
+        seconds = f"{job['seconds']:.1f}s" if job["seconds"] is not None else ""
+        print(f"{job['status']:<10}  {job['title'] or '':<{width}}  {job['attempts']:>5}  {seconds:>8}  "
+              f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(updated)):<19}  {job['error'] or ''}".rstrip())
+
+def print_summary(results, elapsed):
+    """Print the end-of-run table with per-project timing and failures, and latency per API."""
+    failed = sum(1 for r in results if r["error"])
+    cache = llm_cache.get_stats()
+    calls = notion_writer.get_stats()
+    by_kind = instrumentation.summarize(by=("kind",))
+    if instrumentation.LOG_FORMAT == "json":
+        log("run summary", succeeded=len(results) - failed, failed=failed, seconds=round(elapsed, 2),
+            projects=results, llm_cache=cache, notion=calls, by_kind=by_kind)
+        return
+    width = max([len("Project")] + [len(r["title"]) for r in results])
+    print(f"\n{'Project':<{width}}  {'Status':<7}  {'Time':>8}  {'Notion':>6}  Error")
+    print(f"{'-' * width}  {'-' * 7}  {'-' * 8}  {'-' * 6}  {'-' * 5}")
+    for r in results:
+        status = "failed" if r["error"] else "ok"
+        print(f"{r['title']:<{width}}  {status:<7}  {r['seconds']:>7.1f}s  {r['notion_calls']:>6}  "
+              f"{r['error'] or ''}".rstrip())
+    print(f"\n{len(results) - failed} succeeded, {failed} failed in {elapsed:.1f}s")
+    print(f"LLM cache: {cache['hits']} hits, {cache['misses']} misses, {cache['evictions']} evictions")
+    print(f"Notion: {calls['requests']} requests, {calls['throttled']} throttled, "
+          f"{calls['retried']} retried, {calls['failed']} failed")
+    for row in by_kind:
+        tokens = f", {row['input_tokens']} in / {row['output_tokens']} out tokens" if row["input_tokens"] else ""
+        if row["cached_tokens"]:
+            tokens += f" ({row['cached_tokens']} in served from the provider cache)"
+        print(f"{row['kind']}: {row['calls']} calls, {row['total_s']:.1f}s total, p50 {row['p50_s']:.2f}s, "
+              f"p95 {row['p95_s']:.2f}s, {row['retries']} retries, {row['cache_hits']} cache hits{tokens}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate Notion project pages from design PDFs.")
+    parser.add_argument("folder", nargs="?", help="folder containing the design PDFs (prompted for if omitted)")
+    parser.add_argument("--projects", type=int, default=int(os.getenv('PROJECT_WORKERS', '1')),
+                        help="number of projects processed concurrently")
+    parser.add_argument("--gemini-concurrency", type=int, help="cap on in-flight requests per Gemini model, across the batch")
+    parser.add_argument("--claude-concurrency", type=int, help="cap on in-flight requests per Claude model, across the batch")
+    parser.add_argument("--notion-concurrency", type=int, help="global cap on in-flight Notion requests")
+    parser.add_argument("--notion-rate", type=float, help="Notion requests per second across the batch (default 3)")
+    parser.add_argument("--pdf-workers", type=int,
+                        help="processes extracting PDF pages in parallel (default: one per CPU)")
+    parser.add_argument("--max-pages", type=int,
+                        help="only extract and use the first N pages of each PDF (0 = all)")
+    parser.add_argument("--daily-workers", type=int, help="days generated concurrently per project")
+    parser.add_argument("--day-page-workers", type=int,
+                        help="Day pages created concurrently per project (default 1; more is faster but "
+                             "days may be listed out of order)")
+    parser.add_argument("--daily-batch-size", type=int,
+                        help="days generated per structured LLM call (1 disables batching)")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream section text into Notion blocks while it is being generated")
+    parser.add_argument("--condense", action="store_true",
+                        help="condense each design document once and feed the brief to every section")
+    parser.add_argument("--separate-dataset-check", action="store_true",
+                        help="ask whether a dataset is needed in its own call instead of in the dataset plan")
+    parser.add_argument("--sync", action="store_true",
+                        help="update the existing project pages in place, sending only the blocks that changed")
+    parser.add_argument("--no-llm-cache", action="store_true", help="bypass the LLM response cache for this run")
+    parser.add_argument("--no-context-cache", action="store_true",
+                        help="send the design document inline instead of caching it provider-side")
+    parser.add_argument("--restart", action="store_true",
+                        help="ignore the run journals and process every project from scratch")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running: queue new or changed PDFs dropped into the folder and process them "
+                             "with --projects workers")
+    parser.add_argument("--watch-interval", type=float, help="seconds between folder scans in --watch mode (default 5)")
+    parser.add_argument("--status", action="store_true",
+                        help="print the --watch job queue (queued, running, done and failed jobs) and exit")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="parse the PDFs and print the work plan without calling any LLM or Notion")
+    parser.add_argument("--log-format", choices=("text", "json"),
+                        help="text progress messages (default) or one JSON log line per event")
+    parser.add_argument("--report", default=os.getenv('RUN_REPORT'),
+                        help="run report path, .json (with every event) or .csv (per project/stage/API); "
+                             "defaults to a timestamped JSON file next to the run journals")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    global DAILY_WORKERS, DAY_PAGE_WORKERS, DAILY_BATCH_SIZE, STREAM_SECTIONS, SYNC_PAGES
+    args = parse_args(argv)
+    if args.log_format:
+        instrumentation.set_log_format(args.log_format)
+    if args.status:
+        print_status()
+        return 0
+    folder_path = args.folder
+    if folder_path is None:
+        # Get folder path from user input
+        folder_path = input("Enter the folder path containing PDFs: ")
+    folder_path = folder_path.strip().strip('"\'')
+
+    # Check if folder exists
+    if not os.path.exists(folder_path):
+        log(f"❌ Error: Folder not found: {folder_path}", level="error")
+        return 1
+
+    # Concurrency budgets are global: they hold across all projects in the batch
+    if args.gemini_concurrency:
+        llm_providers.set_concurrency("gemini", args.gemini_concurrency)
+    if args.claude_concurrency:
+        llm_providers.set_concurrency("claude", args.claude_concurrency)
+    if args.notion_concurrency:
+        notion_writer.set_concurrency(args.notion_concurrency)
+    if args.notion_rate:
+        notion_writer.set_rate_limit(args.notion_rate)
+    if args.pdf_workers or args.max_pages is not None:
+        document_cache.configure(workers=args.pdf_workers, max_pages=args.max_pages)
+    if args.daily_workers:
+        DAILY_WORKERS = args.daily_workers
+    if args.day_page_workers:
+        DAY_PAGE_WORKERS = args.day_page_workers
+    if args.daily_batch_size:
+        DAILY_BATCH_SIZE = args.daily_batch_size
+    if args.stream:
+        STREAM_SECTIONS = True
+    if args.sync:
+        SYNC_PAGES = True
+    if args.condense:
+        set_condensation(True)
+    if args.separate_dataset_check:
+        set_separate_dataset_check(True)
+    if args.no_llm_cache:
+        llm_cache.configure(bypass=True)
+    if args.no_context_cache:
+        llm_providers.set_context_cache(False)
+
+    if args.watch:
+        return watch_folder(folder_path, workers=args.projects, interval=args.watch_interval)
+
+    # Find all PDF files in the folder
+    pdf_pattern = os.path.join(folder_path, "*.pdf")
+    pdf_files = sorted(glob.glob(pdf_pattern))
+
+    if not pdf_files:
+        log(f"❌ No PDF files found in: {folder_path}", level="error")
+        return 1
+
+    log(f"🚀 Found {len(pdf_files)} PDF files to process ({args.projects} at a time)",
+        pdf_files=len(pdf_files), projects=args.projects)
+    if args.dry_run:
+        print_plan([plan_project(pdf_path, restart=args.restart) for pdf_path in pdf_files])
+        return 0
+    start = time.perf_counter()
+    results = run_batch(pdf_files, projects=args.projects, restart=args.restart)
+    elapsed = time.perf_counter() - start
+    print_summary(results, elapsed)
+    report = args.report or os.path.join(
+        os.getenv('RUN_JOURNAL_DIR', '.runs'), time.strftime("report-%Y%m%d-%H%M%S.json")
+    )
+    instrumentation.write_report(report, extra={"seconds": round(elapsed, 3), "projects": results})
+    log(f"📊 Run report written to {report}", report=report)
+
+    if any(r["error"] for r in results):
+        return 1
+    log("🎉 All content has been generated and updated to Notion!")
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,37 @@
+"""Fixtures for the offline tests: every API is replaced by the fakes in fake_backends."""
+import pytest
+import document_cache
+import fake_backends
+import llm_cache
+import notion_sync
+import notion_writer
+
+# The live API smoke test needs real keys and the Gemini SDK; run it directly with python test_apis.py
+collect_ignore = ["test_apis.py"]
+
+
+@pytest.fixture
+def fakes(tmp_path, monkeypatch):
+    """Fake Gemini, Claude and Notion backends answering instantly, and a scratch working directory.
+
+    Returns the FakeConfig (its `calls` counts requests per backend) with the fake
+    Notion client as its `notion` attribute.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("RUN_JOURNAL_DIR", str(tmp_path / "runs"))
+    config = fake_backends.FakeConfig(llm_latency=0, notion_latency=0, jitter=0, seed=1)
+    config.notion = fake_backends.install(config, patch=monkeypatch.setattr)
+    llm_cache.configure(path=str(tmp_path / "llm_cache.sqlite3"), bypass=True)
+    notion_writer.set_rate_limit(1000)
+    notion_sync._child_pages.clear()
+    document_cache.clear_memory_cache()
+    return config
+
+
+@pytest.fixture
+def design_pdf(tmp_path):
+    """A synthetic five-page design document, long enough to be cached provider-side."""
+    path = tmp_path / "pdfs" / "01. Demo.pdf"
+    path.parent.mkdir()
+    fake_backends.write_synthetic_pdf(str(path), 5, title="Demo")
+    return str(path)
@@ -1,65 +1,123 @@
-import anthropic
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
-import PyPDF2
 import base64
-import time
-import random
 import csv
+import io
+import json
+import threading
+from instrumentation import log
+import llm_providers
 
 # Load environment variables
 load_dotenv()
 
-# Initialize clients
-claude_client = anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
-genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))
+# Optional condensation of the design document into a shorter brief that is fed
+# to every section generator instead of the raw PDF text
+CONDENSE_DESIGN_DOC = os.getenv('CONDENSE_DESIGN_DOC', '').lower() in ('1', 'true', 'yes')
+CONDENSE_MIN_TOKENS = int(os.getenv('CONDENSE_MIN_TOKENS', '6000'))
+_condensed = {}
+_condense_locks = {}
+_condense_guard = threading.Lock()
 
-def safe_generate_content(model, prompt, max_retries=3):
-    """Safely generate content with retry logic for rate limiting"""
-    for attempt in range(max_retries):
-        try:
-            response = model.generate_content(prompt)
-            return response
-        except Exception as e:
-            if "429" in str(e) and "quota" in str(e).lower():
-                if attempt < max_retries - 1:
-                    wait_time = (2 ** attempt) + random.uniform(1, 5)  # Exponential backoff
-                    print(f"Rate limited, waiting {wait_time:.1f} seconds before retry...")
-                    time.sleep(wait_time)
-                    continue
-            raise e
-    return None
-
-def read_pdf(file_path):
-    """Read and extract text from PDF file"""
-    with open(file_path, 'rb') as file:
-        pdf_reader = PyPDF2.PdfReader(file)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text()
+# Size of a generated dataset and of each request for more rows
+DATASET_ROWS = int(os.getenv('DATASET_ROWS', '100'))
+DATASET_CHUNK_ROWS = int(os.getenv('DATASET_CHUNK_ROWS', '50'))
+# Consecutive chunks adding no new rows after which the dataset is cut short
+DATASET_MAX_EMPTY_CHUNKS = 2
+# Ask "is a dataset needed?" in its own call instead of as part of the dataset plan
+SEPARATE_DATASET_CHECK = os.getenv('SEPARATE_DATASET_CHECK', '').lower() in ('1', 'true', 'yes')
+
+class GenerationError(Exception):
+    """The text of a page could not be generated; the stage is left unfinished so a rerun retries it."""
+
+def _generated(text, what):
+    """Return text, raising GenerationError if the model returned nothing."""
+    if not text or not text.strip():
+        raise GenerationError(f"Empty response for {what}")
     return text
 
-def check_dataset_required(pdf_path):
-    design_doc = read_pdf(pdf_path)
-    model = genai.GenerativeModel('gemini-2.5-flash')
+def generate_text(prompt, section, context=None, **params):
+    """Generate text with the Gemini model configured for section, through the shared provider layer.
+
+    context (the design document) is sent ahead of the prompt and cached provider-side.
+    """
+    return llm_providers.generate_sync("gemini", llm_providers.model_for(section), prompt, context=context, **params)
+
+def claude_generate_text(prompt, section, max_tokens=500, context=None):
+    """Generate text with the Claude model configured for section, through the shared provider layer"""
+    model = llm_providers.model_for(section, provider="claude")
+    return llm_providers.generate_sync("claude", model, prompt, max_tokens=max_tokens, context=context)
+
+def set_condensation(enabled, min_tokens=None):
+    """Turn the design-document condensation stage on or off (call before any work starts)."""
+    global CONDENSE_DESIGN_DOC, CONDENSE_MIN_TOKENS
+    CONDENSE_DESIGN_DOC = enabled
+    if min_tokens is not None:
+        CONDENSE_MIN_TOKENS = min_tokens
+
+def set_separate_dataset_check(enabled):
+    """Use the separate yes/no dataset check instead of the combined dataset plan (call before any work starts)."""
+    global SEPARATE_DATASET_CHECK
+    SEPARATE_DATASET_CHECK = enabled
+
+def estimate_tokens(text):
+    """Rough token count of text (about 4 characters per token for English prose)."""
+    return len(text) // 4
+
+def condense_document(document):
+    """Summarise the design document into the brief the section generators need."""
+    prompt = (
+        "Condense the following project design document into a technical brief that will be used to write "
+        "the project's background, architecture, work overview and dataset. Keep, under clear headings: "
+        "the problem and target users, business context and pain points, objectives, core features and user "
+        "workflows, system components and technologies, data entities and fields, integrations, constraints "
+        "and any results or prototypes. Preserve specific names, numbers and technologies. Drop boilerplate, "
+        "repetition and formatting artifacts. Use at most 1500 words.\n\n"
+        f"{document['text']}"
+    )
+    return generate_text(prompt, "condense")
+
+def design_context(document):
+    """Design-document text fed to the section generators.
+
+    With condensation enabled and a document above CONDENSE_MIN_TOKENS, the document
+    is condensed once (the LLM cache keeps the brief across runs) and the brief is
+    returned; otherwise, or if condensation fails, the full text is. Either way it is
+    sent as the shared context ahead of each section's instructions, so the providers
+    cache it once per project.
+    """
+    text = document["text"]
+    if not CONDENSE_DESIGN_DOC or estimate_tokens(text) < CONDENSE_MIN_TOKENS:
+        return text
+    key = document["key"]
+    with _condense_guard:
+        lock = _condense_locks.setdefault(key, threading.Lock())
+    with lock:
+        if key not in _condensed:
+            try:
+                brief = condense_document(document)
+            except Exception as e:
+                log(f"Error in condense_document: {str(e)}", level="error")
+                brief = None
+            _condensed[key] = brief or text
+            before, after = estimate_tokens(text), estimate_tokens(_condensed[key])
+            log(f"🗜️ Design document condensed: ~{before} → ~{after} tokens "
+                f"({100 * after // max(before, 1)}% of the original)", tokens_before=before, tokens_after=after)
+    return _condensed[key]
+
+def check_dataset_required(document):
     prompt = (
-        "Based on the following project design document, does the project require a dataset for its implementation? "
-        "Answer only 'yes' or 'no'.\n\n"
-        f"{design_doc}"
+        "Based on the project design document above, does the project require a dataset for its implementation? "
+        "Answer only 'yes' or 'no'."
     )
-    response = safe_generate_content(model, prompt)
-    answer = response.text.strip().lower() if response else "no"
+    text = generate_text(prompt, "dataset_check", context=design_context(document))
+    answer = text.strip().lower() if text else "no"
     return 'yes' in answer
 
-def generate_background(pdf_path):
-    """Generate background information using Google AI Studio with PDF input"""
-    try:
-        design_doc = read_pdf(pdf_path)
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        prompt = f"""Using this design document as reference:
-        {design_doc}
-        
+def background_prompt(document):
+    """Build the Background Information request for a design document: (context, prompt)"""
+    return design_context(document), """Using the design document above as reference:
+
         Please write a "Background Information" section for this project, following the exact format and tone of the example provided below no bullet points only paragraphs.
         Your output must include:
         Introduction – Briefly describe what the system does and who it is for.
@@ -71,36 +129,35 @@ def generate_background(pdf_path):
         Use this as your format and style reference:
         https://eggplant-gopher-290.notion.site/Background-Information-1e32195181708099a6c1fe2a52e8ecc8
         """
-        response = safe_generate_content(model, prompt)
-        return response.text
-    except Exception as e:
-        print(f"Error in generate_background: {str(e)}")
-        return "Error generating background content"
 
-def generate_engineering(pdf_path):
-    """Generate engineering design as a text-based schema/diagram and explanations only, with Notion-friendly formatting."""
+def generate_background(document):
+    """Generate background information using Google AI Studio with the extracted design document"""
     try:
-        design_doc = read_pdf(pdf_path)
-        # Step 1: Get main components from Claude
-        claude_prompt_components = f"""
-From this project spec:
-{design_doc}
+        context, prompt = background_prompt(document)
+        return _generated(generate_text(prompt, "background", context=context), "background")
+    except Exception as e:
+        log(f"Error in generate_background: {str(e)}", level="error")
+        raise GenerationError(f"Error generating background content: {e}") from e
 
-List only the main system components for a system architecture diagram.
+def engineering_prompt(document):
+    """Build the architecture diagram request, listing the main components obtained from Claude first.
+
+    The diagram prompt only needs the component list, so it has no context: (None, prompt).
+    """
+    # Step 1: Get main components from Claude
+    claude_prompt_components = """
+From the project spec above, list only the main system components for a system architecture diagram.
 Do NOT explain them. Just give a short bullet-point summary like:
 - Frontend (React)
 - Backend (Flask API)
 - PostgreSQL Database
 - Auth0 (external auth service)
 """
-        claude_components_response = claude_client.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=500,
-            messages=[{"role": "user", "content": claude_prompt_components}]
-        )
-        components_list = claude_components_response.content[0].text.strip()
+    components_list = claude_generate_text(
+        claude_prompt_components, "engineering", max_tokens=500, context=design_context(document)
+    ).strip()
 
-        diagram_prompt = f"""
+    return None, f"""
 Please generate a system architecture diagram for this project that is:
 - Student-friendly: Keep all components and labels simple and easy to understand.
 - Clearly connected: Show how each module (e.g., frontend, backend, database, APIs, external services) connects to others using clean, labeled arrows.
@@ -118,24 +175,23 @@ For each component, output the explanation as four separate lines:
 
 Output the diagram as a Markdown code block (use Mermaid, ASCII, or clear indented text), then the explanations.
 """
-        gemini_model = genai.GenerativeModel('gemini-2.5-flash')
-        diagram_response = safe_generate_content(gemini_model, diagram_prompt)
-        diagram_description = diagram_response.text if diagram_response else "Architecture diagram description could not be generated."
+
+def generate_engineering(document):
+    """Generate engineering design as a text-based schema/diagram and explanations only, with Notion-friendly formatting."""
+    try:
+        diagram_description = _generated(generate_text(engineering_prompt(document)[1], "engineering"),
+                                         "the architecture diagram")
         return {
             "schema": diagram_description,
             "component_explanations": ""
         }
     except Exception as e:
-        print(f"Error in generate_engineering: {str(e)}")
-        return {"error": str(e)}
+        log(f"Error in generate_engineering: {str(e)}", level="error")
+        raise GenerationError(f"Error generating engineering content: {e}") from e
 
-def generate_work_overview(pdf_path):
-    """Generate work overview using Google AI Studio with PDF input"""
-    try:
-        design_doc = read_pdf(pdf_path)
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        prompt = f"""Using this design document as reference:
-{design_doc}
+def work_overview_prompt(document):
+    """Build the Work Overview request for a design document: (context, prompt)"""
+    return design_context(document), """Using the design document above as reference:
 
 Please write a Work Overview for this project using the same structure, tone, and length as the example provided below. The output must be structured as a technical yet readable document and include the following sections:
 - Title – A clear, engaging, and technically accurate headline for the system.
@@ -153,17 +209,19 @@ Important guidelines:
 https://eggplant-gopher-290.notion.site/Work-Overview-1e321951817080f29ec6e881c91e5a93
 it is very important to follow same output of text that can be copied to notion
 """
-        response = safe_generate_content(model, prompt)
-        return response.text
-    except Exception as e:
-        print(f"Error in generate_work_overview: {str(e)}")
-        return "Error generating work overview content"
 
-def generate_project_plan():
-    """Generate project plan using Google AI Studio"""
+def generate_work_overview(document):
+    """Generate work overview using Google AI Studio with the extracted design document"""
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        prompt = """Create a high-level project plan for an 8-week h project.
+        context, prompt = work_overview_prompt(document)
+        return _generated(generate_text(prompt, "work_overview", context=context), "work overview")
+    except Exception as e:
+        log(f"Error in generate_work_overview: {str(e)}", level="error")
+        raise GenerationError(f"Error generating work overview content: {e}") from e
+
+def project_plan_prompt():
+    """Build the 8-week project plan prompt (it does not depend on the design document)"""
+    return """Create a high-level project plan for an 8-week h project.
         Include:
         1. Major milestones
         2. Key activities
@@ -179,16 +237,32 @@ def generate_project_plan():
         - Prioritize clarity, structure, and technical realism. Avoid fluff or generic language.
 
         """
-        response = safe_generate_content(model, prompt)
-        return response.text
+
+def generate_project_plan():
+    """Generate project plan using Google AI Studio"""
+    try:
+        return _generated(generate_text(project_plan_prompt(), "project_plan"), "project plan")
     except Exception as e:
-        print(f"Error in generate_project_plan: {str(e)}")
-        return "Error generating project plan content"
+        log(f"Error in generate_project_plan: {str(e)}", level="error")
+        raise GenerationError(f"Error generating project plan content: {e}") from e
+
+# Request builder, returning (context, prompt), of every section page whose text can be
+# streamed straight into Notion
+SECTION_PROMPTS = {
+    "background": background_prompt,
+    "engineering": engineering_prompt,
+    "work_overview": work_overview_prompt,
+    "project_plan": lambda document: (None, project_plan_prompt()),
+}
+
+def stream_section(section, document):
+    """Stream the text of a section page from Gemini chunk by chunk, as it is generated"""
+    context, prompt = SECTION_PROMPTS[section](document)
+    return llm_providers.stream_sync("gemini", llm_providers.model_for(section), prompt, context=context)
 
 def generate_daily_content(day, headers=None):
     """Generate daily content using Google AI Studio, referencing dataset headers if provided."""
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
         if headers:
             prompt = (
                 f"Create a detailed plan for Day {day} of the project.\n"
@@ -211,37 +285,244 @@ def generate_daily_content(day, headers=None):
                 "4. Dependencies and blockers\n"
                 f"Make it specific and actionable for day {day}."
             )
-        response = safe_generate_content(model, prompt)
-        return response.text if response else "Error generating daily content."
+        return _generated(generate_text(prompt, "daily"), f"day {day}")
     except Exception as e:
-        print(f"Error in generate_daily_content: {str(e)}")
-        return f"Error generating content for day {day}"
+        log(f"Error in generate_daily_content: {str(e)}", level="error")
+        raise GenerationError(f"Error generating content for day {day}: {e}") from e
 
-def generate_dataset(pdf_path, project_title=None, output_csv_path=None):
-    """Generate a realistic dataset in CSV format for the project, with at least 100 rows."""
-    design_doc = read_pdf(pdf_path)
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    prompt = (
-        "Based on the following project design document, generate a realistic dataset in CSV format suitable for this project. "
-        "First, define the column headers. Then, provide at least 100 rows of plausible, realistic data (not just a sample). "
-        "Output only the CSV content, no explanations or markdown formatting.\n\n"
-        f"{design_doc}"
+def strip_code_fence(text):
+    """Drop a stray ```json ... ``` fence around a structured response."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    return text
+
+def parse_daily_batch(text, first_day, last_day):
+    """Validate a batched daily-content JSON response; returns {day: content} for the valid days only."""
+    if not text:
+        return {}
+    try:
+        items = json.loads(strip_code_fence(text))
+    except ValueError:
+        return {}
+    if isinstance(items, dict):
+        items = items.get("days", [])
+    days = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        day, content = item.get("day"), item.get("content")
+        if isinstance(day, str) and day.strip().isdigit():
+            day = int(day)
+        if (isinstance(day, int) and first_day <= day <= last_day and day not in days
+                and isinstance(content, str) and content.strip()):
+            days[day] = content.strip()
+    return days
+
+def generate_daily_content_batch(first_day, last_day, headers=None, plan=None):
+    """Generate Days first_day..last_day in one structured (JSON) call.
+
+    Returns {day: content} for every day in the range; days missing from the response
+    or failing validation fall back to one generate_daily_content call each.
+    """
+    prompt = f"Create a detailed plan for each day from Day {first_day} to Day {last_day} of the project.\n"
+    if plan:
+        prompt += (
+            "The days must follow this 8-week project plan (5 working days per week, Day 1 is the first day of Week 1):\n"
+            f"{plan}\n\n"
+        )
+    if headers:
+        prompt += (
+            f"The dataset for this project has the following columns: {headers}.\n"
+            "If any tasks involve data, reference the relevant columns by name.\n"
+        )
+    prompt += (
+        "For each day include:\n"
+        "1. Specific tasks and objectives\n"
+        "2. Required resources\n"
+        "3. Expected outcomes\n"
+        "4. Dependencies and blockers\n"
+        "Make every day specific and actionable, building on the previous days without repeating their tasks.\n"
+        'Respond only with a JSON array containing one object per day, in order: '
+        '[{"day": <day number>, "content": "<the plan for that day as Markdown>"}]'
     )
-    response = safe_generate_content(model, prompt)
-    csv_content = response.text.strip() if response else ""
-    
-    # Generate unique filename based on project title
-    if output_csv_path is None:
-        if project_title:
-            # Clean the project title for filename use
-            safe_title = "".join(c for c in project_title if c.isalnum() or c in (' ', '-', '_')).rstrip()
-            safe_title = safe_title.replace(' ', '_')
-            output_csv_path = f"{safe_title}_dataset.csv"
-        else:
-            output_csv_path = "dataset.csv"
-    
-    # Save to file
-    with open(output_csv_path, "w", encoding="utf-8") as f:
-        f.write(csv_content)
-    print(f"Dataset saved to {output_csv_path}")
-    return output_csv_path 
\ No newline at end of file
+    try:
+        text = generate_text(prompt, "daily", response_mime_type="application/json")
+    except Exception as e:
+        log(f"Error in generate_daily_content_batch: {str(e)}", level="error")
+        text = None
+    days = parse_daily_batch(text, first_day, last_day)
+    for day in range(first_day, last_day + 1):
+        if day not in days:
+            days[day] = generate_daily_content(day, headers=headers)
+    return days
+
+def dataset_path(project_title=None):
+    """Default CSV filename for a project's dataset."""
+    if not project_title:
+        return "dataset.csv"
+    # Clean the project title for filename use
+    safe_title = "".join(c for c in project_title if c.isalnum() or c in (' ', '-', '_')).rstrip()
+    return f"{safe_title.replace(' ', '_')}_dataset.csv"
+
+def parse_csv_chunk(text, headers=None):
+    """Parse a chunk of model-generated CSV into (headers, rows).
+
+    Markdown fence lines are dropped and cells are stripped. Without headers the first
+    row is taken as the header; rows whose column count does not match the header, and
+    repeats of the header itself, are discarded.
+    """
+    lines = [line for line in (text or "").splitlines() if not line.strip().startswith("```")]
+    rows = [[cell.strip() for cell in row] for row in csv.reader(lines)]
+    rows = [row for row in rows if any(row)]
+    if headers is None:
+        if not rows:
+            return None, []
+        headers = rows.pop(0)
+    valid = [row for row in rows if len(row) == len(headers) and row != headers]
+    return headers, valid
+
+def dataset_chunk_prompt(headers, rows_written, sample_rows, count):
+    """Prompt for the next `count` rows of a dataset (the first chunk also defines the header).
+
+    The prompt follows the design document, which is sent ahead of it as the shared context.
+    """
+    if headers is None:
+        return (
+            "Based on the project design document above, generate a realistic dataset in CSV format suitable for this project. "
+            f"First, define the column headers. Then, provide {count} rows of plausible, realistic data (not just a sample). "
+            "Output only the CSV content, no explanations or markdown formatting."
+        )
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows([headers] + sample_rows)
+    return (
+        "Based on the project design document above, continue a realistic CSV dataset for this project. "
+        f"It already has {rows_written} rows; its header and last rows are:\n{buffer.getvalue()}\n"
+        f"Provide the next {count} rows of plausible, realistic data with exactly {len(headers)} columns each, "
+        "continuing any IDs or sequences and without repeating earlier rows. "
+        "Output only the CSV rows, without the header, explanations or markdown formatting."
+    )
+
+def valid_headers(headers):
+    """True if headers is a non-empty list of distinct, non-empty column names."""
+    return bool(headers) and all(headers) and len(set(headers)) == len(headers)
+
+def generate_dataset(document, project_title=None, output_csv_path=None, rows=None, chunk_rows=None,
+                     headers=None, first_rows=None):
+    """Generate a realistic CSV dataset for the project, chunk by chunk.
+
+    Rows are requested DATASET_CHUNK_ROWS at a time, validated against the header with
+    the csv module (column count, duplicates, stray markdown fences) and appended to the
+    file as they arrive, so only one chunk is ever held in memory. headers and
+    first_rows, if given (see plan_dataset), seed the file instead of a first request.
+    Returns (output_csv_path, headers), headers being the list of column names.
+    """
+    rows = rows or DATASET_ROWS
+    chunk_rows = chunk_rows or DATASET_CHUNK_ROWS
+    output_csv_path = output_csv_path or dataset_path(project_title)
+    design_doc = design_context(document)
+    seen = set()
+    sample_rows = []
+    written = 0
+    empty_chunks = 0
+    with open(output_csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        pending = None
+        if headers is not None:
+            writer.writerow(headers)
+            pending = [row for row in first_rows or [] if len(row) == len(headers) and row != headers]
+        while written < rows and empty_chunks < DATASET_MAX_EMPTY_CHUNKS:
+            if pending is None:
+                count = min(chunk_rows, rows - written)
+                prompt = dataset_chunk_prompt(headers, written, sample_rows, count)
+                chunk_headers, pending = parse_csv_chunk(generate_text(prompt, "dataset", context=design_doc), headers)
+                if headers is None:
+                    if not valid_headers(chunk_headers):
+                        raise ValueError(f"Dataset header is missing or invalid: {chunk_headers}")
+                    headers = chunk_headers
+                    writer.writerow(headers)
+            new_rows = []
+            for row in pending:
+                key = hash(tuple(row))
+                if key not in seen:
+                    seen.add(key)
+                    new_rows.append(row)
+            pending = None
+            new_rows = new_rows[:rows - written]
+            writer.writerows(new_rows)
+            f.flush()
+            written += len(new_rows)
+            empty_chunks = 0 if new_rows else empty_chunks + 1
+            sample_rows = (sample_rows + new_rows)[-3:]
+    if written < rows:
+        log(f"⚠️ Dataset stopped at {written} of {rows} rows: the model returned no new valid rows", level="warning")
+    log(f"Dataset saved to {output_csv_path} ({written} rows)", path=output_csv_path, rows=written)
+    return output_csv_path, headers
+
+def parse_dataset_plan(text):
+    """Validate a dataset-planning JSON response.
+
+    Returns {"required": bool, "headers": [...] or None, "rows": [[...], ...]}, or None
+    if the response is not a usable plan. Cells are converted to strings.
+    """
+    try:
+        plan = json.loads(strip_code_fence(text or ""))
+    except ValueError:
+        return None
+    if not isinstance(plan, dict):
+        return None
+    required = plan.get("required")
+    if isinstance(required, str):
+        required = required.strip().lower() in ("yes", "true")
+    if not isinstance(required, bool):
+        return None
+    if not required:
+        return {"required": False, "headers": None, "rows": []}
+    headers = plan.get("columns")
+    if not isinstance(headers, list) or not all(isinstance(h, str) for h in headers):
+        headers = None
+    headers = [h.strip() for h in headers] if headers else None
+    rows = plan.get("rows")
+    rows = [
+        ["" if cell is None else str(cell).strip() for cell in row]
+        for row in (rows if isinstance(rows, list) else []) if isinstance(row, list)
+    ]
+    return {"required": True, "headers": headers if valid_headers(headers) else None, "rows": rows}
+
+def plan_dataset(document, project_title=None, output_csv_path=None):
+    """Decide whether the project needs a dataset and generate it, starting from one combined call.
+
+    A single structured call answers whether a dataset is needed and, if so, proposes the
+    columns and the first rows, which generate_dataset then completes. With
+    SEPARATE_DATASET_CHECK (or when the plan is unusable) the separate yes/no check and
+    dataset calls are used instead. Returns {"required", "headers", "csv_path"}, headers
+    being the list of column names (None without a dataset).
+    """
+    plan = None
+    if not SEPARATE_DATASET_CHECK:
+        prompt = (
+            "Based on the project design document above, decide whether the project requires a dataset for its "
+            "implementation. If it does, design a realistic dataset suitable for this project: define the column "
+            f"headers, then provide {DATASET_CHUNK_ROWS} rows of plausible, realistic data (not just a sample).\n"
+            "Respond with JSON only, in this format:\n"
+            '{"required": true or false, "columns": ["<column name>", ...], "rows": [["<value>", ...], ...]}\n'
+            "Leave columns and rows empty if no dataset is required."
+        )
+        try:
+            plan = parse_dataset_plan(generate_text(
+                prompt, "dataset", context=design_context(document), response_mime_type="application/json"
+            ))
+        except Exception as e:
+            log(f"Error in plan_dataset: {str(e)}", level="error")
+        if plan is None:
+            log("⚠️ Dataset plan response was unusable, falling back to separate calls", level="warning")
+    if plan is None:
+        plan = {"required": check_dataset_required(document), "headers": None, "rows": []}
+    if not plan["required"]:
+        return {"required": False, "headers": None, "csv_path": None}
+    csv_path, headers = generate_dataset(
+        document, project_title=project_title, output_csv_path=output_csv_path,
+        headers=plan["headers"], first_rows=plan["rows"] if plan["headers"] else None,
+    )
+    return {"required": True, "headers": headers, "csv_path": csv_path}
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import instrumentation
+
+# Extracted documents are keyed by path, mtime and size so a PDF is only
+# parsed again when the file on disk actually changes.
+_documents = {}
+_lock = threading.Lock()
+
+# Extraction settings, read lazily so values from a .env file loaded after import are honoured
+_settings = {}
+# Process pool shared by every document being extracted, created on first use
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _config():
+    if not _settings:
+        _settings.update({
+            # Processes extracting page ranges in parallel (1 = extract in the calling thread)
+            "workers": int(os.getenv('PDF_WORKERS') or os.cpu_count() or 1),
+            # Documents with fewer pages to extract than this are not worth a process pool
+            "parallel_min_pages": int(os.getenv('PDF_PARALLEL_MIN_PAGES', '32')),
+            # Only the first max_pages pages are extracted and sent to the LLMs (0 = no cap)
+            "max_pages": int(os.getenv('PDF_MAX_PAGES', '0')),
+        })
+    return _settings
+
+
+def configure(workers=None, max_pages=None, parallel_min_pages=None):
+    """Override the extraction settings (call before the first document is loaded)."""
+    global _pool
+    with _pool_lock:
+        _config()
+        if workers is not None and max(1, workers) != _settings["workers"]:
+            _settings["workers"] = max(1, workers)
+            if _pool is not None:
+                _pool.shutdown()
+                _pool = None
+        if max_pages is not None:
+            _settings["max_pages"] = max_pages
+        if parallel_min_pages is not None:
+            _settings["parallel_min_pages"] = parallel_min_pages
+
+
+def document_key(file_path):
+    """Build the cache key for a PDF from its absolute path, mtime and size."""
+    stat = os.stat(file_path)
+    raw = f"{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest(), stat
+
+
+def _extract_range(file_path, start, stop):
+    # Runs in a worker process: each worker opens the PDF itself
+    import PyPDF2
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return [pdf_reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _page_ranges(indexes, shards):
+    """Group sorted page indexes into at most about `shards` contiguous (start, stop) ranges."""
+    size = max(1, math.ceil(len(indexes) / shards))
+    ranges = []
+    for index in indexes:
+        if ranges and index == ranges[-1][1] and ranges[-1][1] - ranges[-1][0] < size:
+            ranges[-1][1] += 1
+        else:
+            ranges.append([index, index + 1])
+    return [tuple(r) for r in ranges]
+
+
+def _process_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn rather than fork: the bot runs LLM and Notion threads that a fork would copy mid-flight
+            _pool = ProcessPoolExecutor(max_workers=_config()["workers"],
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def page_count(file_path):
+    import PyPDF2
+    with open(file_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+def extract_pages(file_path, max_pages=None, cached=None, on_pages=None):
+    """Extract the text of every page of a PDF (or its first max_pages), one string per page.
+
+    cached maps page indexes to text already extracted; those pages are not parsed
+    again. Large documents are split into contiguous page ranges extracted by a
+    pool of worker processes and reassembled in page order. on_pages, if given,
+    is called with {index: text} for every range as soon as it is done.
+    """
+    settings = _config()
+    total = page_count(file_path)
+    if max_pages:
+        total = min(total, max_pages)
+    texts = dict(cached or {})
+    missing = [i for i in range(total) if i not in texts]
+    if settings["workers"] > 1 and len(missing) >= settings["parallel_min_pages"]:
+        # A few ranges per worker keeps every process busy until the end
+        futures = {
+            _process_pool().submit(_extract_range, file_path, start, stop): start
+            for start, stop in _page_ranges(missing, settings["workers"] * 4)
+        }
+        for future in as_completed(futures):
+            start = futures[future]
+            extracted = dict(enumerate(future.result(), start))
+            texts.update(extracted)
+            if on_pages:
+                on_pages(extracted)
+    elif missing:
+        for start, stop in _page_ranges(missing, 1):
+            extracted = dict(enumerate(_extract_range(file_path, start, stop), start))
+            texts.update(extracted)
+            if on_pages:
+                on_pages(extracted)
+    return [texts[i] for i in range(total)]
+
+
+def _cache_file(cache_dir, key):
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def _read_cached(cache_dir, key):
+    try:
+        with open(_cache_file(cache_dir, key), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cached(cache_dir, key, document):
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = _cache_file(cache_dir, key) + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(document, f)
+    os.replace(tmp_path, _cache_file(cache_dir, key))
+
+
+def _read_cached_pages(cache_dir, key):
+    # Page texts of a PDF extracted by earlier (possibly interrupted or capped) runs
+    pages = _read_cached(cache_dir, f"{key}.pages") or {}
+    return {int(index): text for index, text in pages.items()}
+
+
+def load_document(file_path, cache_dir=None, max_pages=None):
+    """Return the extracted document for a PDF, parsing it only if it is not cached yet.
+
+    The document is a dict with the source path, its fingerprint, the text of each
+    page and the joined text. Only the first max_pages pages (default PDF_MAX_PAGES,
+    0 for all) are included. It is held in memory for the rest of the run and, when
+    cache_dir (or PDF_CACHE_DIR) is set, persisted to disk for later runs together
+    with the text of each page, so pages extracted once are never parsed again.
+    """
+    with instrumentation.timed("pdf", cache_hit=True) as event:
+        file_key, stat = document_key(file_path)
+        max_pages = _config()["max_pages"] if max_pages is None else max_pages
+        key = f"{file_key}-p{max_pages}" if max_pages else file_key
+        with _lock:
+            document = _documents.get(key)
+        if document is not None:
+            return document
+
+        cache_dir = cache_dir or os.getenv('PDF_CACHE_DIR')
+        document = _read_cached(cache_dir, key) if cache_dir else None
+        if document is None:
+            event["cache_hit"] = False
+            cached = _read_cached_pages(cache_dir, file_key) if cache_dir else {}
+            on_pages = None
+            if cache_dir:
+                def on_pages(extracted):
+                    # Saved range by range, so an interrupted extraction resumes where it stopped
+                    cached.update(extracted)
+                    _write_cached(cache_dir, f"{file_key}.pages", cached)
+            event["cached_pages"] = len(cached)
+            pages = extract_pages(file_path, max_pages=max_pages, cached=dict(cached), on_pages=on_pages)
+            document = {
+                "key": key,
+                "path": os.path.abspath(file_path),
+                "mtime": stat.st_mtime,
+                "size": stat.st_size,
+                "pages": pages,
+                "text": "".join(pages),
+            }
+            if cache_dir:
+                _write_cached(cache_dir, key, document)
+        event["pages"] = len(document["pages"])
+
+    with _lock:
+        # Another thread may have parsed the same file meanwhile; keep the first one.
+        document = _documents.setdefault(key, document)
+    return document
+
+
+def clear_memory_cache():
+    """Drop all documents held in memory (the on-disk cache is left untouched)."""
+    with _lock:
+        _documents.clear()
@@ -0,0 +1,560 @@
+"""Local stand-ins for the Gemini, Claude and Notion clients, for offline benchmarks.
+
+The fakes answer with plausible content shaped like what each pipeline stage
+expects (JSON for the structured calls, CSV rows for datasets, Markdown for
+pages) after a configurable latency, and can inject transient errors and 429s.
+install() wires them into llm_providers and bot; nothing here is used by a
+normal run.
+"""
+import asyncio
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import types
+import uuid
+
+
+class FakeConfig:
+    """Latency (seconds, +/- jitter fraction), error rate and 429 rate of the fake backends."""
+
+    def __init__(self, llm_latency=0.05, notion_latency=0.02, jitter=0.5, error_rate=0.0,
+                 rate_limit_rate=0.0, response_chars=3000, seed=None):
+        self.llm_latency = llm_latency
+        self.notion_latency = notion_latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.response_chars = response_chars
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = {}
+
+    def count(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def delay(self, base):
+        with self._lock:
+            return base * self._random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def failure(self):
+        """None, "rate_limit" or "error", drawn with the configured probabilities."""
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            return "rate_limit"
+        if roll < self.rate_limit_rate + self.error_rate:
+            return "error"
+        return None
+
+
+# Exceptions named and shaped like the real ones, so llm_providers.classify_error
+# and notion_writer.call treat them exactly as they would in production.
+class ResourceExhausted(Exception):
+    code = 429
+
+
+class ServiceUnavailable(Exception):
+    code = 503
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class InternalServerError(Exception):
+    status_code = 529
+
+
+class APIResponseError(Exception):
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+
+
+_SENTENCES = [
+    "The system ingests records from the upstream API and normalises them into the reporting schema.",
+    "Each **component** exposes a small interface so it can be tested and deployed on its own.",
+    "Users review the generated summary, adjust the thresholds and export the results as a report.",
+    "Failures are retried with backoff and surfaced on the operations dashboard.",
+    "The data model tracks *customers*, orders and invoices with full audit history.",
+]
+
+
+def fake_markdown(prompt, size):
+    """Markdown text of about `size` characters, loosely shaped like a generated page."""
+    seed = sum(map(ord, prompt[:200]))
+    lines = ["# Overview"]
+    length = 0
+    for i in itertools.count():
+        if i % 6 == 0:
+            line = f"## Section {i // 6 + 1}"
+        elif i % 3 == 0:
+            line = f"- {_SENTENCES[(seed + i) % len(_SENTENCES)]}"
+        else:
+            line = _SENTENCES[(seed + i) % len(_SENTENCES)]
+        lines.append(line)
+        length += len(line) + 1
+        if length >= size:
+            break
+    return "\n".join(lines)
+
+
+def fake_response(prompt, size, structured=False):
+    """Pick a response matching what the prompt asks for."""
+    days = re.search(r"from Day (\d+) to Day (\d+)", prompt)
+    if structured and days:
+        first, last = int(days.group(1)), int(days.group(2))
+        per_day = max(200, size // 4)
+        return json.dumps([{"day": day, "content": fake_markdown(f"day {day}", per_day)}
+                           for day in range(first, last + 1)])
+    if "requires a dataset" in prompt and structured:
+        count = int(re.search(r"provide (\d+) rows", prompt).group(1))
+        return json.dumps({
+            "required": True,
+            "columns": ["id", "customer", "amount", "status"],
+            "rows": [[i, f"customer-{i}", f"{10 + i * 1.5:.2f}", "open"] for i in range(1, count + 1)],
+        })
+    if "does the project require a dataset" in prompt:
+        return "yes"
+    match = re.search(r"It already has (\d+) rows.*?next (\d+) rows.*?exactly (\d+) columns", prompt, re.S)
+    if match:
+        start, count, columns = (int(g) for g in match.groups())
+        return "\n".join(",".join([str(start + i + 1)] + [f"value-{start + i + 1}-{c}" for c in range(1, columns)])
+                         for i in range(count))
+    if "define the column headers" in prompt:
+        count = int(re.search(r"provide (\d+) rows", prompt).group(1)) if "provide" in prompt else 50
+        rows = [f"{i},customer-{i},{10 + i * 1.5:.2f},open" for i in range(1, count + 1)]
+        return "\n".join(["id,customer,amount,status"] + rows)
+    return fake_markdown(prompt, size)
+
+
+def _split(text, parts=8):
+    step = max(1, len(text) // parts)
+    return [text[i:i + step] for i in range(0, len(text), step)]
+
+
+class _Usage:
+    def __init__(self, prompt, text, cached="", cache_write=""):
+        # Gemini counts cached tokens in the prompt total, Anthropic reports them separately
+        self.prompt_token_count = (len(cached) + len(prompt)) // 4
+        self.cached_content_token_count = len(cached) // 4
+        self.candidates_token_count = len(text) // 4
+        self.input_tokens = len(prompt) // 4
+        self.cache_read_input_tokens = len(cached) // 4
+        self.cache_creation_input_tokens = len(cache_write) // 4
+        self.output_tokens = self.candidates_token_count
+
+
+class _GeminiResponse:
+    def __init__(self, text, usage=None):
+        self.text = text
+        self.parts = [text] if text else []
+        self.usage_metadata = usage
+
+
+class _GeminiStream:
+    def __init__(self, chunks, usage, chunk_delay):
+        self._chunks = chunks
+        self._usage = usage
+        self._chunk_delay = chunk_delay
+
+    async def __aiter__(self):
+        for i, chunk in enumerate(self._chunks):
+            await asyncio.sleep(self._chunk_delay)
+            yield _GeminiResponse(chunk, self._usage if i == len(self._chunks) - 1 else None)
+
+
+class FakeGenerativeModel:
+    """Stand-in for genai.GenerativeModel (async generation only, which is all the pipeline uses)."""
+
+    def __init__(self, name, config, cached_content=None):
+        self.model_name = name
+        self.config = config
+        self.cached_content = cached_content
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        config = self.config
+        config.count("gemini")
+        cached = ""
+        if self.cached_content is not None:
+            config.count("gemini_context_reads")
+            cached = self.cached_content.text
+        await asyncio.sleep(config.delay(config.llm_latency))
+        failure = config.failure()
+        if failure == "rate_limit":
+            raise ResourceExhausted("429 Resource has been exhausted (e.g. check quota).")
+        if failure == "error":
+            raise ServiceUnavailable("503 The model is overloaded. Please try again later.")
+        structured = (generation_config or {}).get("response_mime_type") == "application/json"
+        # The response depends on the whole prompt, cached part included, as with the real API
+        text = fake_response(f"{cached}\n\n{prompt}" if cached else prompt, config.response_chars, structured)
+        usage = _Usage(prompt, text, cached=cached)
+        if stream:
+            chunks = _split(text)
+            return _GeminiStream(chunks, usage, config.delay(config.llm_latency) / len(chunks))
+        return _GeminiResponse(text, usage)
+
+
+class _FakeCachedContent:
+    def __init__(self, name, model, text):
+        self.name = name
+        self.model = model
+        self.text = text
+
+
+class _FakeCachedContents:
+    """Stand-in for genai.caching.CachedContent; every entry created is kept in `created`."""
+
+    def __init__(self, config):
+        self.config = config
+        self.created = []
+        self._lock = threading.Lock()
+
+    def create(self, model, contents=None, ttl=None, **kwargs):
+        self.config.count("gemini_context_caches")
+        time.sleep(self.config.delay(self.config.llm_latency))
+        with self._lock:
+            entry = _FakeCachedContent(f"cachedContents/{len(self.created) + 1}", model, "".join(contents or []))
+            self.created.append(entry)
+        return entry
+
+
+class _FakeModels:
+    """Callable like the genai.GenerativeModel class, including from_cached_content."""
+
+    def __init__(self, config):
+        self.config = config
+
+    def __call__(self, name, **kwargs):
+        return FakeGenerativeModel(name, self.config)
+
+    def from_cached_content(self, cached_content, **kwargs):
+        return FakeGenerativeModel(cached_content.model, self.config, cached_content=cached_content)
+
+
+class FakeGenAI:
+    """Module-like stand-in for google.generativeai."""
+
+    def __init__(self, config):
+        self.config = config
+        self.GenerativeModel = _FakeModels(config)
+        self.caching = types.SimpleNamespace(CachedContent=_FakeCachedContents(config))
+
+    def configure(self, **kwargs):
+        pass
+
+
+class _ClaudeContent:
+    def __init__(self, text):
+        self.type = "text"
+        self.text = text
+
+
+class _ClaudeMessage:
+    def __init__(self, prompt, text, cached="", cache_write=""):
+        self.content = [_ClaudeContent(text)]
+        self.usage = _Usage(prompt, text, cached=cached, cache_write=cache_write)
+
+
+class _ClaudeStream:
+    def __init__(self, message, text, chunk_delay, failure):
+        self._message = message
+        self._chunks = _split(text)
+        self._chunk_delay = chunk_delay
+        self._failure = failure
+
+    async def __aenter__(self):
+        if self._failure:
+            raise self._failure
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    @property
+    async def text_stream(self):
+        for chunk in self._chunks:
+            await asyncio.sleep(self._chunk_delay)
+            yield chunk
+
+    async def get_final_message(self):
+        return self._message
+
+
+class _FakeMessages:
+    def __init__(self, config):
+        self.config = config
+        # Prefixes marked with cache_control so far, like Anthropic's prompt cache (without expiry)
+        self._cached_prefixes = set()
+        self._lock = threading.Lock()
+
+    def _message(self, messages, max_tokens):
+        """Build the response to messages, counting prompt-cache writes and reads."""
+        content = messages[-1]["content"]
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        prompt = "\n\n".join(block["text"] for block in content)
+        cached = cache_write = ""
+        marked = [i for i, block in enumerate(content) if block.get("cache_control")]
+        if marked:
+            prefix = "\n\n".join(block["text"] for block in content[:marked[-1] + 1])
+            with self._lock:
+                hit = prefix in self._cached_prefixes
+                self._cached_prefixes.add(prefix)
+            self.config.count("claude_context_reads" if hit else "claude_context_caches")
+            cached, cache_write = (prefix, "") if hit else ("", prefix)
+        uncached = prompt[len(cached or cache_write):]
+        text = fake_response(prompt, min(self.config.response_chars, max_tokens * 4))
+        return _ClaudeMessage(uncached, text, cached=cached, cache_write=cache_write), text
+
+    def _failure(self):
+        failure = self.config.failure()
+        if failure == "rate_limit":
+            return RateLimitError("Error code: 429 - rate_limit_error")
+        if failure == "error":
+            return InternalServerError("Error code: 529 - overloaded_error")
+        return None
+
+    async def create(self, model, max_tokens, messages, **kwargs):
+        config = self.config
+        config.count("claude")
+        await asyncio.sleep(config.delay(config.llm_latency))
+        failure = self._failure()
+        if failure:
+            raise failure
+        return self._message(messages, max_tokens)[0]
+
+    def stream(self, model, max_tokens, messages, **kwargs):
+        config = self.config
+        config.count("claude")
+        failure = self._failure()
+        message, text = self._message(messages, max_tokens) if failure is None else (None, "")
+        return _ClaudeStream(message, text, config.delay(config.llm_latency) / 8, failure)
+
+
+class FakeAsyncAnthropic:
+    """Stand-in for anthropic.AsyncAnthropic."""
+
+    def __init__(self, config):
+        self.messages = _FakeMessages(config)
+
+
+def _created_time():
+    # Like Notion's created_time: ISO 8601 in UTC, rounded down to the minute
+    return time.strftime("%Y-%m-%dT%H:%M:00.000Z", time.gmtime())
+
+
+class _Endpoint:
+    def __init__(self, client):
+        self._client = client
+
+
+class _Pages(_Endpoint):
+    def create(self, parent, properties, children=None, **kwargs):
+        return self._client._request("pages.create", self._client._create_page, parent, properties, children or [])
+
+    def update(self, page_id, **kwargs):
+        return self._client._request("pages.update", self._client._update_page, page_id, kwargs)
+
+    def retrieve(self, page_id):
+        return self._client._request("pages.retrieve", lambda: self._client.pages_by_id[page_id])
+
+
+class _Children(_Endpoint):
+    def append(self, block_id, children, after=None):
+        return self._client._request("blocks.children.append", self._client._append, block_id, children, after)
+
+    def list(self, block_id, start_cursor=None, page_size=100):
+        return self._client._request("blocks.children.list", self._client._list, block_id, start_cursor, page_size)
+
+
+class _Blocks(_Endpoint):
+    def __init__(self, client):
+        super().__init__(client)
+        self.children = _Children(client)
+
+    def update(self, block_id, **kwargs):
+        return self._client._request("blocks.update", self._client._update_block, block_id, kwargs)
+
+    def delete(self, block_id):
+        return self._client._request("blocks.delete", self._client._delete_block, block_id)
+
+
+class FakeNotionClient:
+    """In-memory stand-in for notion_client.Client.
+
+    Pages and blocks are kept in memory so content can be inspected after a run;
+    every request sleeps for the configured latency and may fail with a 429 (with
+    Retry-After) or a 502.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.pages_by_id = {}
+        self.children = {}
+        self.blocks_by_id = {}
+        self._lock = threading.Lock()
+        self.pages = _Pages(self)
+        self.blocks = _Blocks(self)
+
+    def search(self, query=None, **kwargs):
+        def find():
+            with self._lock:
+                results = [page for page in self.pages_by_id.values()
+                           if not page["archived"] and (not query or query in page["title"])]
+            return {"results": results, "has_more": False, "next_cursor": None}
+        return self._request("search", find)
+
+    def _request(self, name, handler, *args):
+        config = self.config
+        config.count("notion")
+        time.sleep(config.delay(config.notion_latency))
+        failure = config.failure()
+        if failure == "rate_limit":
+            raise APIResponseError(429, "Rate limited", retry_after=0.05)
+        if failure == "error":
+            raise APIResponseError(502, "Bad gateway")
+        return handler(*args)
+
+    def _store_blocks(self, parent_id, blocks):
+        stored = []
+        for block in blocks:
+            block = dict(block, id=str(uuid.uuid4()), parent_id=parent_id, created_time=_created_time())
+            self.blocks_by_id[block["id"]] = block
+            stored.append(block)
+        return stored
+
+    def _create_page(self, parent, properties, children):
+        page_id = str(uuid.uuid4())
+        title = "".join(item["text"]["content"] for item in properties["title"])
+        page = {"object": "page", "id": page_id, "parent": parent, "archived": False, "title": title,
+                "properties": properties, "created_time": _created_time()}
+        with self._lock:
+            self.pages_by_id[page_id] = page
+            self.children[page_id] = self._store_blocks(page_id, children)
+            parent_id = parent.get("page_id")
+            if parent_id:
+                child_page = {"object": "block", "id": page_id, "type": "child_page",
+                              "child_page": {"title": title}, "created_time": page["created_time"]}
+                self.children.setdefault(parent_id, []).append(child_page)
+        return page
+
+    def _update_page(self, page_id, fields):
+        with self._lock:
+            page = self.pages_by_id[page_id]
+            page.update(fields)
+            if fields.get("archived"):
+                # Archived pages no longer show up among their parent's children
+                siblings = self.children.get(page["parent"].get("page_id"), [])
+                siblings[:] = [b for b in siblings if b["id"] != page_id]
+            return page
+
+    def _append(self, block_id, children, after):
+        with self._lock:
+            existing = self.children.setdefault(block_id, [])
+            stored = self._store_blocks(block_id, children)
+            position = len(existing)
+            if after is not None:
+                position = next(i for i, block in enumerate(existing) if block["id"] == after) + 1
+            existing[position:position] = stored
+        return {"object": "list", "results": stored}
+
+    def _list(self, block_id, start_cursor, page_size):
+        with self._lock:
+            blocks = list(self.children.get(block_id, []))
+        start = int(start_cursor or 0)
+        end = start + page_size
+        return {"object": "list", "results": blocks[start:end], "has_more": end < len(blocks),
+                "next_cursor": str(end) if end < len(blocks) else None}
+
+    def _update_block(self, block_id, fields):
+        with self._lock:
+            block = self.blocks_by_id[block_id]
+            block.update(fields)
+            return block
+
+    def _delete_block(self, block_id):
+        with self._lock:
+            block = self.blocks_by_id.pop(block_id)
+            siblings = self.children.get(block["parent_id"], [])
+            siblings[:] = [b for b in siblings if b["id"] != block_id]
+        return dict(block, archived=True)
+
+
+# llm_providers.backoff_delay as it was before the first install, so repeated installs scale it only once
+_real_backoff_delay = None
+
+
+def install(config, backoff_scale=0.01, patch=setattr):
+    """Point llm_providers and bot at fake backends built from config; returns the fake Notion client.
+
+    backoff_scale shrinks the LLM retry backoff so injected errors do not dominate
+    a benchmark's wall time (the retry count is what gets compared). Every module
+    attribute is replaced through patch(obj, name, value); tests pass
+    monkeypatch.setattr so that each one is restored afterwards.
+    """
+    import bot
+    import llm_providers
+    import notion_writer
+
+    global _real_backoff_delay
+    if _real_backoff_delay is None:
+        _real_backoff_delay = llm_providers.backoff_delay
+    real_backoff = _real_backoff_delay
+    gemini, claude = llm_providers.PROVIDERS["gemini"], llm_providers.PROVIDERS["claude"]
+    patch(llm_providers, "genai", FakeGenAI(config))
+    patch(gemini, "_models", {})
+    patch(gemini, "_contexts", {})
+    patch(claude, "_client", FakeAsyncAnthropic(config))
+    patch(claude, "_context_uses", {})
+    patch(llm_providers, "backoff_delay", lambda kind, attempt: real_backoff(kind, attempt) * backoff_scale)
+    notion = FakeNotionClient(config)
+    patch(bot, "notion", notion_writer.ThrottledClient(notion))
+    return notion
+
+
+def _pdf_string(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_synthetic_pdf(path, pages, lines_per_page=45, title="Synthetic Project"):
+    """Write a text PDF of `pages` pages that PyPDF2 can extract, shaped like a design document."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for number in range(1, pages + 1):
+        lines = [f"{title} - section {number}"] + [
+            f"{number}.{i} {_SENTENCES[(number + i) % len(_SENTENCES)]}".replace("*", "")
+            for i in range(1, lines_per_page)
+        ]
+        stream = "BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(f"({_pdf_string(line)}) Tj T*" for line in lines) + " ET"
+        stream = stream.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> "
+            b"/Contents %d 0 R >>" % len(objects)
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), pages
+    )
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(output)
+    return path
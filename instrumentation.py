@@ -0,0 +1,210 @@
+import contextlib
+import contextvars
+import csv
+import itertools
+import json
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Project and stage of the work running in the current thread / asyncio task.
+# Worker pools and the LLM event loop copy the submitter's context, so every
+# recorded event and log line is attributed to the project and stage that caused it.
+_project = contextvars.ContextVar("project", default=None)
+_stage = contextvars.ContextVar("stage", default=None)
+# Run of a project: projects are named by their title, which two PDFs can share
+_run = contextvars.ContextVar("run", default=None)
+_run_ids = itertools.count(1)
+
+# "text" prints the usual messages, "json" prints one JSON object per line
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+
+_events = []
+_events_lock = threading.Lock()
+_print_lock = threading.Lock()
+
+
+def set_log_format(log_format):
+    """Switch between "text" and "json" (structured) log output (call before any work starts)."""
+    global LOG_FORMAT
+    LOG_FORMAT = log_format
+
+
+def current_project():
+    return _project.get()
+
+
+def current_stage():
+    return _stage.get()
+
+
+def current_run():
+    return _run.get()
+
+
+@contextlib.contextmanager
+def project(name):
+    """Attribute everything done inside the block (and in work it submits) to a project.
+
+    Each block is a separate run with its own ID (current_run()), so the events of two
+    projects with the same title can still be told apart.
+    """
+    token = _project.set(name)
+    run_token = _run.set(next(_run_ids))
+    try:
+        yield
+    finally:
+        _run.reset(run_token)
+        _project.reset(token)
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Attribute everything done inside the block (and in work it submits) to a pipeline stage."""
+    token = _stage.set(name)
+    try:
+        yield
+    finally:
+        _stage.reset(token)
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor running each task in a copy of the submitter's context."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def log(message, level="info", end="\n", **fields):
+    """Print a progress message, or a JSON log line carrying the project, stage and fields."""
+    if LOG_FORMAT == "json":
+        if not message.strip() and not fields:
+            return
+        entry = {"ts": round(time.time(), 3), "level": level, "project": _project.get(), "stage": _stage.get(),
+                 "msg": message.strip()}
+        entry.update(fields)
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with _print_lock:
+            print(line, file=sys.stderr if level == "error" else sys.stdout, flush=True)
+    else:
+        print(message, end=end, flush=end != "\n")
+
+
+def record(kind, seconds, **fields):
+    """Record one timed operation (a PDF parse, an LLM call, a Notion request...)."""
+    event = {"project": _project.get(), "run": _run.get(), "stage": _stage.get(), "kind": kind, "seconds": seconds}
+    event.update(fields)
+    with _events_lock:
+        _events.append(event)
+
+
+@contextlib.contextmanager
+def timed(kind, **fields):
+    """Time the block and record it as an event of kind.
+
+    Yields the event's fields so the block can add to them (retries, sizes, token
+    usage, cache_hit...); an exception escaping the block is recorded as its error.
+    """
+    start = time.perf_counter()
+    try:
+        yield fields
+    except Exception as e:
+        fields.setdefault("error", type(e).__name__)
+        raise
+    finally:
+        record(kind, time.perf_counter() - start, **fields)
+
+
+def events():
+    """Return a copy of every event recorded so far."""
+    with _events_lock:
+        return list(_events)
+
+
+def reset():
+    with _events_lock:
+        _events.clear()
+
+
+def pop_events(run):
+    """Remove and return the events of one project run (keeps a long-running process's memory flat)."""
+    with _events_lock:
+        popped = [e for e in _events if e["run"] == run]
+        _events[:] = [e for e in _events if e["run"] != run]
+    return popped
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list of numbers."""
+    values = sorted(values)
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def _report_stage(name):
+    # The 40 day:N stages are reported as one "daily" stage
+    if name and name.startswith("day:"):
+        return "daily"
+    return name
+
+
+def summarize(recorded=None, by=("project", "stage", "kind")):
+    """Aggregate events into one row per combination of the `by` fields.
+
+    Each row has the call count, total / p50 / p95 / max seconds, retries, errors, cache
+    hits, prompt and response characters and input / output / provider-cached tokens.
+    """
+    groups = {}
+    for event in events() if recorded is None else recorded:
+        key = tuple(_report_stage(event.get(f)) if f == "stage" else event.get(f) for f in by)
+        groups.setdefault(key, []).append(event)
+    rows = []
+    for key, group in sorted(groups.items(), key=lambda item: tuple(str(k) for k in item[0])):
+        seconds = [e["seconds"] for e in group]
+        row = dict(zip(by, key))
+        row.update({
+            "calls": len(group),
+            "total_s": round(sum(seconds), 3),
+            "p50_s": round(percentile(seconds, 0.50), 3),
+            "p95_s": round(percentile(seconds, 0.95), 3),
+            "max_s": round(max(seconds), 3),
+            "retries": sum(e.get("retries", 0) for e in group),
+            "errors": sum(1 for e in group if e.get("error")),
+            "cache_hits": sum(1 for e in group if e.get("cache_hit")),
+            "prompt_chars": sum(e.get("prompt_chars", 0) for e in group),
+            "response_chars": sum(e.get("response_chars", 0) for e in group),
+            "input_tokens": sum(e.get("input_tokens") or 0 for e in group),
+            "output_tokens": sum(e.get("output_tokens") or 0 for e in group),
+            "cached_tokens": sum(e.get("cached_tokens") or 0 for e in group),
+        })
+        rows.append(row)
+    return rows
+
+
+def write_report(path, extra=None, recorded=None):
+    """Write the run report: a CSV of per-project/stage/kind rows, or JSON with the raw events too.
+
+    recorded defaults to every event recorded so far.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    recorded = events() if recorded is None else recorded
+    rows = summarize(recorded)
+    if path.endswith(".csv"):
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else ["project", "stage", "kind"])
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        report = dict(extra or {})
+        report.update({
+            "by_kind": summarize(recorded, by=("kind",)),
+            "by_project_stage": rows,
+            "events": recorded,
+        })
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1, default=str)
+    return path
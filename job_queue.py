@@ -0,0 +1,143 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+# A queued job whose file changed again before it ran; the newer version is queued instead
+SUPERSEDED = "superseded"
+
+
+def file_hash(path):
+    """SHA-256 of a file's content, the key of its job."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def queue_path():
+    return os.getenv('JOB_QUEUE_PATH') or os.path.join(os.getenv('RUN_JOURNAL_DIR', '.runs'), 'jobs.sqlite3')
+
+
+class JobQueue:
+    """Durable queue of PDFs to process, one job per distinct file content.
+
+    Jobs live in a small SQLite database, so the queue and the history of completed
+    and failed jobs survive restarts of the watcher. The same content is only ever
+    queued once; a changed file gets a new job. A failed job is queued again after
+    a delay until it has been attempted max_attempts times.
+    """
+
+    def __init__(self, path=None, max_attempts=None, retry_delay=None):
+        self.path = path or queue_path()
+        self.max_attempts = max_attempts or int(os.getenv('WATCH_MAX_ATTEMPTS', '3'))
+        self.retry_delay = float(os.getenv('WATCH_RETRY_DELAY', '60')) if retry_delay is None else retry_delay
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " hash TEXT PRIMARY KEY, path TEXT, title TEXT, status TEXT, attempts INTEGER DEFAULT 0,"
+            " error TEXT, report TEXT, enqueued_at REAL, available_at REAL, started_at REAL,"
+            " finished_at REAL, seconds REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, available_at)")
+        self._conn.commit()
+
+    def enqueue(self, path, content_hash, title=None):
+        """Queue a file unless its content already has a job; returns True if a job was added."""
+        now = time.time()
+        with self._lock:
+            added = self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (hash, path, title, status, enqueued_at, available_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (content_hash, os.path.abspath(path), title, QUEUED, now, now),
+            ).rowcount == 1
+            if added:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ? WHERE path = ? AND status = ? AND hash != ?",
+                    (SUPERSEDED, os.path.abspath(path), QUEUED, content_hash),
+                )
+            self._conn.commit()
+        return added
+
+    def claim(self):
+        """Mark the oldest job that is due as running and return it as a dict (None if there is none).
+
+        A file whose previous version is still running waits for it, as both would share one run journal.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT hash FROM jobs WHERE status = ? AND available_at <= ?"
+                " AND path NOT IN (SELECT path FROM jobs WHERE status = ?) ORDER BY available_at LIMIT 1",
+                (QUEUED, now, RUNNING),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, error = NULL WHERE hash = ?",
+                (RUNNING, now, row[0]),
+            )
+            self._conn.commit()
+        return self.get(row[0])
+
+    def finish(self, content_hash, error=None, seconds=None, report=None):
+        """Record the outcome of a running job; a failure is queued again while attempts remain."""
+        now = time.time()
+        with self._lock:
+            attempts = self._conn.execute("SELECT attempts FROM jobs WHERE hash = ?", (content_hash,)).fetchone()[0]
+            if error is None:
+                status, available_at = DONE, None
+            elif attempts < self.max_attempts:
+                status, available_at = QUEUED, now + self.retry_delay * attempts
+            else:
+                status, available_at = FAILED, None
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, seconds = ?, report = ?, finished_at = ?,"
+                " available_at = COALESCE(?, available_at) WHERE hash = ?",
+                (status, error, seconds, report, now, available_at, content_hash),
+            )
+            self._conn.commit()
+        return status
+
+    def recover(self):
+        """Queue again the jobs left running by a watcher that stopped mid-job; returns how many."""
+        with self._lock:
+            count = self._conn.execute(
+                "UPDATE jobs SET status = ?, available_at = ? WHERE status = ?", (QUEUED, time.time(), RUNNING)
+            ).rowcount
+            self._conn.commit()
+        return count
+
+    def get(self, content_hash):
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM jobs WHERE hash = ?", (content_hash,))
+            row = cursor.fetchone()
+            return dict(zip([c[0] for c in cursor.description], row)) if row else None
+
+    def counts(self):
+        """Number of jobs per status."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def recent(self, limit=20):
+        """The most recently queued or updated jobs, newest first."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT * FROM jobs ORDER BY COALESCE(finished_at, started_at, enqueued_at) DESC LIMIT ?", (limit,)
+            )
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
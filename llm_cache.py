@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Content-addressed cache of LLM responses, stored in a local SQLite file.
+# Entries are keyed by model name, prompt hash and generation parameters, expire
+# after a TTL and are evicted least-recently-used once the store grows too big.
+_lock = threading.Lock()
+_conn = None
+_settings = {}
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+
+def _config():
+    # Read lazily so values from a .env file loaded after import are honoured
+    if not _settings:
+        _settings.update({
+            "path": os.getenv('LLM_CACHE_PATH', os.path.join('.cache', 'llm_responses.sqlite3')),
+            "ttl": float(os.getenv('LLM_CACHE_TTL', str(30 * 24 * 3600))),
+            "max_bytes": int(float(os.getenv('LLM_CACHE_MAX_MB', '200')) * 1024 * 1024),
+            "bypass": os.getenv('LLM_CACHE_BYPASS', '').lower() in ('1', 'true', 'yes'),
+        })
+    return _settings
+
+
+def configure(path=None, ttl=None, max_bytes=None, bypass=None):
+    """Override the cache settings (call before the first lookup)."""
+    global _conn
+    with _lock:
+        _config()
+        if path is not None and path != _settings["path"]:
+            if _conn is not None:
+                _conn.close()
+                _conn = None
+            _settings["path"] = path
+        if ttl is not None:
+            _settings["ttl"] = ttl
+        if max_bytes is not None:
+            _settings["max_bytes"] = max_bytes
+        if bypass is not None:
+            _settings["bypass"] = bypass
+
+
+def _connection():
+    global _conn
+    if _conn is None:
+        directory = os.path.dirname(_settings["path"])
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _conn = sqlite3.connect(_settings["path"], check_same_thread=False)
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT, response TEXT,"
+            " created_at REAL, accessed_at REAL, size INTEGER)"
+        )
+        _conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        _conn.commit()
+    return _conn
+
+
+def cache_key(model, prompt, params=None):
+    """Hash the model name, prompt and generation parameters into a cache key."""
+    prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+    raw = json.dumps({"model": model, "prompt": prompt_hash, "params": params or {}}, sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def lookup(model, prompt, **params):
+    """Return the cached response for this call, or None on a miss (or when bypassed)."""
+    if _config()["bypass"]:
+        return None
+    key = cache_key(model, prompt, params)
+    now = time.time()
+    with _lock:
+        conn = _connection()
+        row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None and now - row[1] > _settings["ttl"]:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            conn.commit()
+            row = None
+        if row is None:
+            _stats["misses"] += 1
+            return None
+        conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        conn.commit()
+        _stats["hits"] += 1
+        return row[0]
+
+
+def store(model, prompt, response, **params):
+    """Save a response and evict the least recently used entries if over the size limit."""
+    if _config()["bypass"] or not response:
+        return
+    key = cache_key(model, prompt, params)
+    now = time.time()
+    size = len(response.encode('utf-8'))
+    with _lock:
+        conn = _connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, model, response, created_at, accessed_at, size)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model, response, now, now, size),
+        )
+        _stats["stores"] += 1
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > _settings["max_bytes"]:
+            for old_key, old_size in conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at"
+            ).fetchall():
+                if total <= _settings["max_bytes"]:
+                    break
+                conn.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                total -= old_size
+                _stats["evictions"] += 1
+        conn.commit()
+
+
+def get_stats():
+    """Return a copy of the hit/miss/store/eviction counters."""
+    with _lock:
+        return dict(_stats)
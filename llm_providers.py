@@ -0,0 +1,484 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import hashlib
+import os
+import queue
+import random
+import threading
+import time
+from dotenv import load_dotenv
+import instrumentation
+import llm_cache
+
+# Load environment variables
+load_dotenv()
+
+# The Gemini and Anthropic SDKs are slow to import, so they are only loaded (and
+# configured) on the first call that needs them
+genai = None
+_genai_lock = threading.Lock()
+
+# Error classes; everything but PERMANENT is retried with jittered backoff
+RATE_LIMIT = "rate_limit"
+OVERLOADED = "overloaded"
+TIMEOUT = "timeout"
+PERMANENT = "permanent"
+RETRYABLE = (RATE_LIMIT, OVERLOADED, TIMEOUT)
+
+MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '4'))
+REQUEST_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '180'))
+
+# Provider-side caching of a shared prompt prefix (the design document): a Gemini
+# CachedContent per model and document, Anthropic prompt caching for Claude.
+# Contexts shorter than the providers' minimum cacheable size are sent inline.
+CONTEXT_CACHE = os.getenv('LLM_CONTEXT_CACHE', '1').lower() in ('1', 'true', 'yes')
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv('LLM_CONTEXT_CACHE_MIN_TOKENS', '1024'))
+GEMINI_CACHE_TTL = int(os.getenv('GEMINI_CACHE_TTL', '900'))
+
+# Default model per provider; each section can override it with
+# <PROVIDER>_MODEL_<SECTION>, e.g. GEMINI_MODEL_DAILY=gemini-2.5-flash-lite
+DEFAULT_MODELS = {
+    "gemini": os.getenv('GEMINI_MODEL', 'gemini-2.5-flash'),
+    "claude": os.getenv('CLAUDE_MODEL', 'claude-3-5-sonnet-20241022'),
+}
+
+# In-flight request cap per model, by provider
+_limits = {
+    "gemini": int(os.getenv('GEMINI_MAX_CONCURRENCY', '4')),
+    "claude": int(os.getenv('CLAUDE_MAX_CONCURRENCY', '2')),
+}
+_semaphores = {}
+
+
+class LLMError(Exception):
+    """A provider call that failed for good, tagged with its error class."""
+
+    def __init__(self, kind, provider, model, cause):
+        super().__init__(f"{provider} ({model}) {kind}: {cause}")
+        self.kind = kind
+        self.provider = provider
+        self.model = model
+
+
+def classify_error(exc):
+    """Map a Gemini/Anthropic/transport exception to RATE_LIMIT, OVERLOADED, TIMEOUT or PERMANENT."""
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError)):
+        return TIMEOUT
+    # anthropic errors carry status_code, google.api_core errors carry an HTTP status as code
+    status = getattr(exc, 'status_code', None) or getattr(exc, 'code', None)
+    if isinstance(status, int):
+        if status == 429:
+            return RATE_LIMIT
+        if status in (408, 504):
+            return TIMEOUT
+        if status >= 500:
+            return OVERLOADED
+        return PERMANENT
+    name = type(exc).__name__
+    if name in ('RateLimitError', 'ResourceExhausted', 'TooManyRequests'):
+        return RATE_LIMIT
+    if name in ('APITimeoutError', 'DeadlineExceeded', 'ReadTimeout', 'ConnectTimeout', 'PoolTimeout'):
+        return TIMEOUT
+    if name in ('APIConnectionError', 'ServiceUnavailable', 'InternalServerError', 'OverloadedError',
+                'ConnectError', 'RemoteProtocolError'):
+        return OVERLOADED
+    message = str(exc).lower()
+    if '429' in message or 'quota' in message or 'rate limit' in message:
+        return RATE_LIMIT
+    if 'overloaded' in message or '503' in message:
+        return OVERLOADED
+    return PERMANENT
+
+
+def backoff_delay(kind, attempt):
+    """Full-jitter exponential backoff; rate limits back off from a longer base."""
+    base = 4.0 if kind == RATE_LIMIT else 1.0
+    return random.uniform(base / 2, min(60.0, base * 2 ** attempt))
+
+
+def _context_gone(exc):
+    """Whether a Gemini error means the CachedContent no longer exists (expired or deleted)."""
+    return getattr(exc, 'code', None) == 404 or type(exc).__name__ == 'NotFound'
+
+
+def _gemini():
+    """google.generativeai, imported and configured with GOOGLE_API_KEY on first use."""
+    global genai
+    with _genai_lock:
+        if genai is None:
+            import google.generativeai
+            google.generativeai.configure(api_key=os.getenv('GOOGLE_API_KEY'))
+            genai = google.generativeai
+        return genai
+
+
+def model_for(section, provider="gemini"):
+    """Model name configured for a section (falls back to the provider's default model)."""
+    return os.getenv(f"{provider.upper()}_MODEL_{section.upper()}") or DEFAULT_MODELS[provider]
+
+
+class GeminiProvider:
+    """Gemini models, each built once and reused by every call (and its gRPC channel)."""
+    name = "gemini"
+
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+        # (model, context hash) -> (creation time, task creating its CachedContent), shared by concurrent callers
+        self._contexts = {}
+
+    def model(self, name):
+        with self._lock:
+            if name not in self._models:
+                self._models[name] = _gemini().GenerativeModel(name)
+            return self._models[name]
+
+    def _create_context(self, model, context):
+        # Runs in a worker thread; a failure (model without caching support, context below
+        # the model's minimum size...) only means the context is sent inline instead
+        with instrumentation.timed("gemini", model=model, context_cache="create", prompt_chars=len(context)):
+            try:
+                cached = _gemini().caching.CachedContent.create(
+                    model=model, contents=[context], ttl=GEMINI_CACHE_TTL
+                )
+            except Exception as e:
+                instrumentation.log(f"gemini context cache unavailable for {model}, sending the document inline: {e}",
+                                    level="warning", provider=self.name, model=model)
+                return None
+        return _gemini().GenerativeModel.from_cached_content(cached)
+
+    def _context_key(self, model, context):
+        return model, hashlib.sha1(context.encode('utf-8')).hexdigest()
+
+    async def _context_model(self, model, context):
+        """The model bound to a CachedContent holding context, or None to send context inline."""
+        if not _cacheable(context):
+            return None
+        key = self._context_key(model, context)
+        now = time.monotonic()
+        # Entries live as long as their CachedContent (GEMINI_CACHE_TTL); a failed creation is retried
+        # after as long, and documents a watcher saw earlier do not pile up
+        for stale in [k for k, (created, _) in self._contexts.items() if now - created >= GEMINI_CACHE_TTL]:
+            del self._contexts[stale]
+        if key not in self._contexts:
+            task = asyncio.ensure_future(asyncio.to_thread(self._create_context, model, context))
+            self._contexts[key] = (now, task)
+        return await asyncio.shield(self._contexts[key][1])
+
+    async def _request(self, model, prompt, context, params, stream=False):
+        cached_model = await self._context_model(model, context)
+        if cached_model is not None:
+            try:
+                return await cached_model.generate_content_async(
+                    prompt, generation_config=params or None, stream=stream
+                )
+            except Exception as e:
+                if not _context_gone(e):
+                    raise
+                # The cache entry expired (GEMINI_CACHE_TTL) or was deleted: the next call creates it again
+                self._contexts.pop(self._context_key(model, context), None)
+        return await self.model(model).generate_content_async(
+            with_context(prompt, context), generation_config=params or None, stream=stream
+        )
+
+    @staticmethod
+    def _usage(response, usage):
+        metadata = getattr(response, 'usage_metadata', None)
+        if metadata and metadata.prompt_token_count:
+            usage["input_tokens"] = metadata.prompt_token_count
+            usage["output_tokens"] = metadata.candidates_token_count
+            if getattr(metadata, 'cached_content_token_count', 0):
+                usage["cached_tokens"] = metadata.cached_content_token_count
+
+    async def complete(self, model, prompt, usage=None, context=None, **params):
+        response = await self._request(model, prompt, context, params)
+        if usage is not None:
+            self._usage(response, usage)
+        return response.text
+
+    async def stream(self, model, prompt, usage=None, context=None, **params):
+        response = await self._request(model, prompt, context, params, stream=True)
+        async for chunk in response:
+            if usage is not None:
+                # Every chunk carries the running totals; the last one has the final counts
+                self._usage(chunk, usage)
+            # Chunks carrying only safety/finish metadata have no text parts
+            if chunk.parts:
+                yield chunk.text
+
+
+class ClaudeProvider:
+    """One Anthropic client per process, with a keep-alive connection pool sized to the caps."""
+    name = "claude"
+
+    def __init__(self):
+        self._client = None
+        # (model, context hash) -> calls that have sent the context so far
+        self._context_uses = {}
+
+    def client(self):
+        # Only ever called on the shared loop, so no lock is needed
+        if self._client is None:
+            import anthropic
+            import httpx
+            pool_size = max(_limits["claude"] * 2, 4)
+            self._client = anthropic.AsyncAnthropic(
+                api_key=os.getenv('ANTHROPIC_API_KEY'),
+                max_retries=0,
+                http_client=anthropic.DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=pool_size,
+                        max_keepalive_connections=pool_size,
+                        keepalive_expiry=120,
+                    )
+                ),
+            )
+        return self._client
+
+    def _context_key(self, model, context):
+        return model, hashlib.sha1(context.encode('utf-8')).hexdigest()
+
+    def _messages(self, model, prompt, context):
+        if not context:
+            return [{"role": "user", "content": prompt}]
+        context_block = {"type": "text", "text": context}
+        # Writing the cache costs 25% more than plain input, so a context is only marked
+        # once a call has already sent it: a document Claude sees once is never cached.
+        # Everything up to this breakpoint is then cached for 5 minutes and read at a
+        # tenth of the price. Only ever called on the shared loop, so no lock is needed.
+        if _cacheable(context) and self._context_uses.get(self._context_key(model, context)):
+            context_block["cache_control"] = {"type": "ephemeral"}
+        return [{"role": "user", "content": [context_block, {"type": "text", "text": prompt}]}]
+
+    def _sent(self, model, context):
+        if _cacheable(context):
+            key = self._context_key(model, context)
+            self._context_uses[key] = self._context_uses.get(key, 0) + 1
+
+    @staticmethod
+    def _usage(message, usage):
+        usage["input_tokens"] = message.usage.input_tokens
+        usage["output_tokens"] = message.usage.output_tokens
+        if getattr(message.usage, 'cache_read_input_tokens', None):
+            usage["cached_tokens"] = message.usage.cache_read_input_tokens
+        if getattr(message.usage, 'cache_creation_input_tokens', None):
+            usage["cache_write_tokens"] = message.usage.cache_creation_input_tokens
+
+    async def complete(self, model, prompt, usage=None, context=None, max_tokens=1024, **params):
+        response = await self.client().messages.create(
+            model=model,
+            max_tokens=max_tokens,
+            messages=self._messages(model, prompt, context),
+            **params
+        )
+        self._sent(model, context)
+        if usage is not None:
+            self._usage(response, usage)
+        return response.content[0].text
+
+    async def stream(self, model, prompt, usage=None, context=None, max_tokens=1024, **params):
+        async with self.client().messages.stream(
+            model=model,
+            max_tokens=max_tokens,
+            messages=self._messages(model, prompt, context),
+            **params
+        ) as response:
+            async for text in response.text_stream:
+                yield text
+            self._sent(model, context)
+            if usage is not None:
+                self._usage(await response.get_final_message(), usage)
+
+
+PROVIDERS = {provider.name: provider for provider in (GeminiProvider(), ClaudeProvider())}
+
+
+def set_context_cache(enabled):
+    """Turn provider-side caching of shared prompt contexts on or off (call before any work starts)."""
+    global CONTEXT_CACHE
+    CONTEXT_CACHE = enabled
+
+
+def with_context(prompt, context=None):
+    """The prompt as sent when its context is not cached by the provider: context first, then the prompt."""
+    return f"{context}\n\n{prompt}" if context else prompt
+
+
+def _cacheable(context):
+    # About 4 characters per token
+    return bool(context) and CONTEXT_CACHE and len(context) // 4 >= CONTEXT_CACHE_MIN_TOKENS
+
+
+def set_concurrency(provider, limit):
+    """Set the in-flight request cap per model of a provider (call before any work starts)."""
+    _limits[provider] = limit
+
+
+def _semaphore(provider, model):
+    # Only ever called on the shared loop, so no lock is needed
+    key = (provider, model)
+    if key not in _semaphores:
+        _semaphores[key] = asyncio.Semaphore(_limits[provider])
+    return _semaphores[key]
+
+
+async def generate(provider, model, prompt, timeout=None, max_retries=None, context=None, **params):
+    """Generate text with a provider, retrying transient failures and serving repeats from the cache.
+
+    context, if given, is a long prefix shared by several prompts (the design document);
+    it goes ahead of the prompt and is cached provider-side (see CONTEXT_CACHE).
+    params are passed to the provider (generation config for Gemini, max_tokens etc.
+    for Claude) and are part of the cache key. Raises LLMError once retries run out
+    or on a permanent error. Every call is recorded by instrumentation.
+    """
+    full_prompt = with_context(prompt, context)
+    with instrumentation.timed(provider, model=model, prompt_chars=len(full_prompt), retries=0) as event:
+        cached = await asyncio.to_thread(llm_cache.lookup, model, full_prompt, **params)
+        event["cache_hit"] = cached is not None
+        if cached is not None:
+            event["response_chars"] = len(cached)
+            return cached
+        timeout = timeout or REQUEST_TIMEOUT
+        max_retries = MAX_RETRIES if max_retries is None else max_retries
+        for attempt in range(max_retries + 1):
+            try:
+                async with _semaphore(provider, model):
+                    text = await asyncio.wait_for(
+                        PROVIDERS[provider].complete(model, prompt, usage=event, context=context, **params), timeout
+                    )
+                break
+            except Exception as e:
+                kind = classify_error(e)
+                if kind not in RETRYABLE or attempt == max_retries:
+                    raise LLMError(kind, provider, model, e) from e
+                delay = backoff_delay(kind, attempt)
+                event["retries"] += 1
+                instrumentation.log(f"{provider} {kind}, retrying in {delay:.1f} seconds...", level="warning",
+                                    provider=provider, model=model, error=kind, delay=round(delay, 1))
+                await asyncio.sleep(delay)
+        event["response_chars"] = len(text)
+        await asyncio.to_thread(llm_cache.store, model, full_prompt, text, **params)
+        return text
+
+
+async def stream(provider, model, prompt, timeout=None, max_retries=None, context=None, **params):
+    """Yield the generated text chunk by chunk, with the same retries, caps and cache as generate().
+
+    A failure is only retried while nothing has been yielded yet; timeout bounds the
+    wait for each chunk. The complete text is cached once the stream finishes, and a
+    cache hit is yielded as a single chunk.
+    """
+    full_prompt = with_context(prompt, context)
+    with instrumentation.timed(provider, model=model, prompt_chars=len(full_prompt), retries=0,
+                               streamed=True) as event:
+        cached = await asyncio.to_thread(llm_cache.lookup, model, full_prompt, **params)
+        event["cache_hit"] = cached is not None
+        if cached is not None:
+            event["response_chars"] = len(cached)
+            yield cached
+            return
+        timeout = timeout or REQUEST_TIMEOUT
+        max_retries = MAX_RETRIES if max_retries is None else max_retries
+        parts = []
+        for attempt in range(max_retries + 1):
+            try:
+                async with _semaphore(provider, model):
+                    chunks = PROVIDERS[provider].stream(
+                        model, prompt, usage=event, context=context, **params
+                    ).__aiter__()
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+                        except StopAsyncIteration:
+                            break
+                        parts.append(chunk)
+                        yield chunk
+                break
+            except Exception as e:
+                kind = classify_error(e)
+                if parts or kind not in RETRYABLE or attempt == max_retries:
+                    raise LLMError(kind, provider, model, e) from e
+                delay = backoff_delay(kind, attempt)
+                event["retries"] += 1
+                instrumentation.log(f"{provider} {kind}, retrying in {delay:.1f} seconds...", level="warning",
+                                    provider=provider, model=model, error=kind, delay=round(delay, 1))
+                await asyncio.sleep(delay)
+        text = "".join(parts)
+        event["response_chars"] = len(text)
+        await asyncio.to_thread(llm_cache.store, model, full_prompt, text, **params)
+
+
+# One event loop, running in a background thread, serves every LLM call of the
+# process so semaphores and clients are shared by all worker threads.
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-event-loop", daemon=True).start()
+        return _loop
+
+
+def submit(coro):
+    """Schedule a coroutine on the shared LLM event loop; returns a concurrent.futures.Future.
+
+    Unlike asyncio.run_coroutine_threadsafe, the task runs in a copy of the caller's
+    context, so instrumentation attributes its events to the caller's project and stage.
+    """
+    loop = _get_loop()
+    result = concurrent.futures.Future()
+
+    def on_done(task):
+        if task.cancelled():
+            result.cancel()
+        elif task.exception() is not None:
+            result.set_exception(task.exception())
+        else:
+            result.set_result(task.result())
+
+    def start():
+        # Runs in the copied context, which create_task then copies into the task
+        loop.create_task(coro).add_done_callback(on_done)
+
+    loop.call_soon_threadsafe(start, context=contextvars.copy_context())
+    return result
+
+
+def run(coro):
+    """Run a coroutine on the shared LLM event loop and wait for its result from any thread."""
+    return submit(coro).result()
+
+
+def generate_sync(provider, model, prompt, **kwargs):
+    """Blocking form of generate() for the thread-based pipeline stages."""
+    return run(generate(provider, model, prompt, **kwargs))
+
+
+_END = object()
+
+
+def stream_sync(provider, model, prompt, **kwargs):
+    """Iterate over stream() from a worker thread; chunks are handed over through a queue."""
+    chunks = queue.Queue()
+
+    async def pump():
+        try:
+            async for chunk in stream(provider, model, prompt, **kwargs):
+                chunks.put(chunk)
+        except Exception as e:
+            chunks.put(e)
+        chunks.put(_END)
+
+    submit(pump())
+    while True:
+        item = chunks.get()
+        if item is _END:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
@@ -0,0 +1,146 @@
+import re
+from notion_writer import MAX_RICH_TEXT_LENGTH, rich_text, rich_text_blocks
+
+# One compiled pattern classifies every line in a single match: code fences,
+# headings, bulleted and numbered list items and whole-line bold pseudo-headings.
+_LINE = re.compile(r"""
+    (?P<fence>```|~~~)\s*(?P<lang>[\w+#.-]*).*$
+  | (?P<hashes>\#{1,6})\s+(?P<heading>.*?)(?:\s+\#+)?\s*$
+  | [-*+]\s+(?P<bullet>.*)$
+  | \d{1,3}[.)]\s+(?P<number>.*)$
+  | \*\*(?P<bold_line>[^*]+?)\*\*$
+""", re.VERBOSE)
+
+# Inline formatting, scanned left to right in one pass per line. The italic
+# lookbehind follows the literal '*' so the regex engine can still skip ahead to it.
+_INLINE = re.compile(r"""
+    \*\*\*(?P<bold_italic>.+?)\*\*\*
+  | \*\*(?P<bold>.+?)\*\*
+  | \*(?<![\w*]\*)(?P<italic>[^*\s](?:[^*]*?[^*\s])?)\*(?![\w*])
+  | `(?P<code>[^`]+)`
+  | \[(?P<label>[^\]]+)\]\((?P<url>https?://[^)\s]+)\)
+""", re.VERBOSE)
+
+_ANNOTATIONS = {
+    "bold_italic": {"bold": True, "italic": True},
+    "bold": {"bold": True},
+    "italic": {"italic": True},
+    "code": {"code": True},
+}
+
+# Fence languages mapped to the names Notion accepts for code blocks
+_LANGUAGES = {
+    "": "plain text", "text": "plain text", "txt": "plain text", "ascii": "plain text", "plaintext": "plain text",
+    "mermaid": "mermaid", "py": "python", "python": "python", "js": "javascript", "javascript": "javascript",
+    "ts": "typescript", "typescript": "typescript", "json": "json", "sql": "sql", "yaml": "yaml", "yml": "yaml",
+    "sh": "shell", "shell": "shell", "bash": "bash", "html": "html", "css": "css", "java": "java",
+    "c": "c", "cpp": "c++", "c++": "c++", "go": "go", "rust": "rust", "markdown": "markdown", "md": "markdown",
+}
+
+_HEADING_TYPES = {1: "heading_1", 2: "heading_2"}
+
+
+# Characters that can start inline formatting; lines without any skip the inline scan
+_INLINE_MARKERS = re.compile(r"[*`\[]")
+
+
+def _segment(text, annotations=None, href=None):
+    # Most segments fit in one rich_text item, so skip the splitting for them
+    if len(text) > MAX_RICH_TEXT_LENGTH:
+        return rich_text(text, annotations=annotations, href=href)
+    item = {"type": "text", "text": {"content": text}}
+    if href:
+        item["text"]["link"] = {"url": href}
+    if annotations:
+        item["annotations"] = annotations
+    return [item]
+
+
+def inline_rich_text(text):
+    """Convert one line of Markdown into rich_text items with bold/italic/code/link annotations."""
+    if not _INLINE_MARKERS.search(text):
+        return _segment(text)
+    items = []
+    position = 0
+    for match in _INLINE.finditer(text):
+        if match.start() > position:
+            items += _segment(text[position:match.start()])
+        kind = match.lastgroup
+        if kind == "url":
+            items += _segment(match.group("label"), href=match.group("url"))
+        else:
+            items += _segment(match.group(kind), annotations=_ANNOTATIONS[kind])
+        position = match.end()
+    if position < len(text):
+        items += _segment(text[position:])
+    return items
+
+
+class MarkdownConverter:
+    """Incremental Markdown-to-Notion converter.
+
+    feed() takes text made of complete lines and returns the blocks finished so far;
+    a fenced code block is held back until its closing fence (or close()). This lets
+    streamed output be converted as it arrives with the same result as a single pass.
+    """
+
+    def __init__(self):
+        self._code_lines = None
+        self._code_language = None
+
+    def feed(self, text):
+        blocks = []
+        # split("\n") rather than splitlines(): a streamed "" or "code\n" still carries a
+        # blank line, which matters inside a code block
+        for raw_line in text.split("\n"):
+            raw_line = raw_line.rstrip("\r")
+            if self._code_lines is not None:
+                if raw_line.strip() in ("```", "~~~"):
+                    blocks.extend(self._finish_code())
+                else:
+                    self._code_lines.append(raw_line)
+                continue
+            line = raw_line.strip()
+            if not line:
+                continue
+            match = _LINE.match(line)
+            # lastgroup is the innermost group that closed last: "lang" for a fence line
+            kind = match.lastgroup if match else None
+            if kind == "lang":
+                self._code_lines = []
+                self._code_language = _LANGUAGES.get(match.group("lang").lower(), "plain text")
+            elif kind == "heading":
+                level = len(match.group("hashes"))
+                block_type = _HEADING_TYPES.get(level, "heading_3")
+                blocks.extend(rich_text_blocks(block_type, inline_rich_text(match.group("heading"))))
+            elif kind == "bullet":
+                blocks.extend(rich_text_blocks("bulleted_list_item", inline_rich_text(match.group("bullet"))))
+            elif kind == "number":
+                blocks.extend(rich_text_blocks("numbered_list_item", inline_rich_text(match.group("number"))))
+            elif kind == "bold_line":
+                blocks.extend(rich_text_blocks("heading_3", rich_text(match.group("bold_line"))))
+            else:
+                blocks.extend(rich_text_blocks("paragraph", inline_rich_text(line)))
+        return blocks
+
+    def close(self):
+        """Flush a code block whose closing fence never arrived."""
+        if self._code_lines is None:
+            return []
+        return self._finish_code()
+
+    def _finish_code(self):
+        code = "\n".join(self._code_lines)
+        language = self._code_language
+        self._code_lines = None
+        self._code_language = None
+        if not code.strip():
+            return []
+        return rich_text_blocks("code", rich_text(code), language=language)
+
+
+def markdown_to_notion_blocks(text):
+    """Convert a Markdown document into Notion blocks in a single pass."""
+    converter = MarkdownConverter()
+    # A final newline ends the last line; it does not start another one
+    return converter.feed(text[:-1] if text.endswith("\n") else text) + converter.close()
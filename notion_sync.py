@@ -0,0 +1,184 @@
+import difflib
+import hashlib
+import json
+import threading
+
+# Blocks that are pages or databases in their own right, not content of the page
+_CHILD_OBJECT_TYPES = ("child_page", "child_database")
+
+# Child pages per parent, listed once per run: {parent_id: {title: page_id}}
+_child_pages = {}
+_child_pages_lock = threading.Lock()
+
+
+def _rich_text_signature(items):
+    # Adjacent runs with the same formatting are merged, so a paragraph compares
+    # equal however Notion (or our 2000-character splitting) cut it into items.
+    runs = []
+    for item in items:
+        text = item.get("text") or {}
+        content = text.get("content", item.get("plain_text", ""))
+        link = (text.get("link") or {}).get("url")
+        annotations = item.get("annotations") or {}
+        style = sorted(k for k, v in annotations.items() if v is True)
+        if annotations.get("color", "default") != "default":
+            style.append(annotations["color"])
+        if runs and runs[-1][1] == link and runs[-1][2] == style:
+            runs[-1][0] += content
+        else:
+            runs.append([content, link, style])
+    return runs
+
+
+def block_signature(block):
+    """Hash of what a block shows: its type, text, formatting and (for code) language.
+
+    Works for blocks we generate and for blocks returned by the Notion API, which
+    carry IDs, timestamps and default annotations that are ignored here.
+    """
+    block_type = block["type"]
+    payload = block.get(block_type) or {}
+    signature = [block_type, _rich_text_signature(payload.get("rich_text", [])), payload.get("language")]
+    return hashlib.sha1(json.dumps(signature).encode('utf-8')).hexdigest()
+
+
+def blocks_hash(blocks):
+    """Hash of a whole list of blocks, stored in the run journal to skip unchanged pages."""
+    digest = hashlib.sha1()
+    for block in blocks:
+        digest.update(block_signature(block).encode('ascii'))
+    return digest.hexdigest()
+
+
+def list_children(notion, block_id):
+    """Every child block of a block, following pagination."""
+    blocks = []
+    cursor = None
+    while True:
+        kwargs = {"block_id": block_id, "page_size": 100}
+        if cursor:
+            kwargs["start_cursor"] = cursor
+        response = notion.blocks.children.list(**kwargs)
+        blocks.extend(response["results"])
+        if not response.get("has_more"):
+            return blocks
+        cursor = response["next_cursor"]
+
+
+def find_child_page(notion, parent_id, title):
+    """ID of the page titled `title` directly under parent_id, or None.
+
+    The children of each parent are listed once per run; pages created later in the
+    run are added with remember_child_page().
+    """
+    with _child_pages_lock:
+        pages = _child_pages.get(parent_id)
+    if pages is None:
+        pages = {}
+        for block in list_children(notion, parent_id):
+            if block["type"] == "child_page":
+                pages.setdefault(block["child_page"]["title"], block["id"])
+        with _child_pages_lock:
+            pages = _child_pages.setdefault(parent_id, pages)
+    return pages.get(title)
+
+
+def remember_child_page(parent_id, title, page_id):
+    with _child_pages_lock:
+        if parent_id in _child_pages:
+            _child_pages[parent_id][title] = page_id
+
+
+def _append_after(notion, page_id, blocks, after):
+    """Insert blocks after the block `after` (None = at the end); returns the last inserted block's ID."""
+    for i in range(0, len(blocks), 100):
+        kwargs = {"block_id": page_id, "children": blocks[i:i + 100]}
+        if after:
+            kwargs["after"] = after
+        results = notion.blocks.children.append(**kwargs).get("results") or []
+        after = results[-1]["id"] if results else after
+    return after
+
+
+def _edit_script(existing, blocks):
+    """Diff existing blocks against new ones into keep/update/delete/insert steps, in page order."""
+    old = [block_signature(b) for b in existing]
+    new = [block_signature(b) for b in blocks]
+    steps = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes():
+        if tag == "equal":
+            steps += [("keep", o, n) for o, n in zip(existing[i1:i2], blocks[j1:j2])]
+            continue
+        olds, news = existing[i1:i2], blocks[j1:j2]
+        if tag == "replace":
+            for o, n in zip(olds, news):
+                if o["type"] == n["type"]:
+                    steps.append(("update", o, n))
+                else:
+                    steps += [("delete", o, None), ("insert", None, n)]
+            olds, news = olds[len(news):], news[len(olds):]
+        steps += [("delete", o, None) for o in olds]
+        steps += [("insert", None, n) for n in news]
+    return steps
+
+
+def sync_blocks(notion, page_id, blocks):
+    """Make the content of an existing page equal to blocks with as few requests as possible.
+
+    The page's current blocks are diffed against the new ones by signature. Unchanged
+    blocks are left alone, changed blocks of the same type are updated in place and
+    the rest become deletes and inserts at the right position (consecutive inserts
+    share one append request). Child pages are not touched; on a page that has no
+    other blocks the new ones can only go after them. Returns the number of blocks
+    updated, deleted and inserted.
+    """
+    existing = [b for b in list_children(notion, page_id) if b["type"] not in _CHILD_OBJECT_TYPES]
+    changes = {"updated": 0, "deleted": 0, "inserted": 0}
+    anchor = None       # ID of the last block already in its final place
+    pending = []        # new blocks waiting to be inserted after anchor
+    placeholder = None  # first deleted block, kept until the end as an insertion point
+
+    def update(block, new_block):
+        block_type = new_block["type"]
+        notion.blocks.update(block_id=block["id"], **{block_type: new_block[block_type]})
+        changes["updated"] += 1
+
+    def delete(block):
+        nonlocal anchor, placeholder
+        changes["deleted"] += 1
+        if anchor is None:
+            # Notion can only insert after a block: keep the first deleted block around
+            # so new blocks land ahead of any child pages instead of at the very end
+            placeholder = block
+            anchor = block["id"]
+        else:
+            notion.blocks.delete(block_id=block["id"])
+
+    for step, old_block, new_block in _edit_script(existing, blocks):
+        if step == "insert":
+            pending.append(new_block)
+        elif step == "delete":
+            delete(old_block)
+        elif pending and anchor is None:
+            # Blocks going before the first surviving one are written into it instead
+            # and its own content moves down
+            if old_block["type"] == pending[0]["type"]:
+                update(old_block, pending.pop(0))
+                anchor = old_block["id"]
+            else:
+                delete(old_block)
+            pending.append(new_block)
+        else:
+            if pending:
+                changes["inserted"] += len(pending)
+                anchor = _append_after(notion, page_id, pending, anchor)
+                pending = []
+            if step == "update":
+                update(old_block, new_block)
+            anchor = old_block["id"]
+    if pending:
+        changes["inserted"] += len(pending)
+        _append_after(notion, page_id, pending, anchor)
+    if placeholder is not None:
+        notion.blocks.delete(block_id=placeholder["id"])
+    return changes
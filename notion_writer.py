@@ -0,0 +1,342 @@
+import os
+import random
+import threading
+import time
+import instrumentation
+import notion_sync
+
+# Limits of the Notion API for a single request / block
+MAX_CHILDREN_PER_REQUEST = 100
+MAX_RICH_TEXT_LENGTH = 2000
+MAX_RICH_TEXT_ITEMS = 100
+
+# Cap on in-flight Notion requests, shared by every project in the batch
+notion_slots = threading.BoundedSemaphore(int(os.getenv('NOTION_MAX_CONCURRENCY', '3')))
+
+
+def set_concurrency(limit):
+    """Replace the global cap on in-flight Notion requests (call before any work starts)."""
+    global notion_slots
+    notion_slots = threading.BoundedSemaphore(limit)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Hold back every caller for `seconds`, e.g. after the server asked us to slow down."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+
+limiter = TokenBucket(float(os.getenv('NOTION_RATE_LIMIT', '3')), float(os.getenv('NOTION_BURST', '3')))
+MAX_RETRIES = int(os.getenv('NOTION_MAX_RETRIES', '5'))
+_stats = {"requests": 0, "throttled": 0, "retried": 0, "failed": 0}
+_stats_lock = threading.Lock()
+
+# Transport-level failures worth retrying (raised by httpx / notion_client without a status)
+_TRANSIENT_ERRORS = {"RequestTimeoutError", "ConnectError", "ConnectTimeout", "ReadTimeout",
+                     "ReadError", "RemoteProtocolError", "PoolTimeout"}
+# The subset raised before the request reached Notion, so it cannot have been applied
+_UNSENT_ERRORS = {"ConnectError", "ConnectTimeout", "PoolTimeout"}
+
+
+def set_rate_limit(rate, burst=None):
+    """Replace the shared limiter (call before any work starts)."""
+    global limiter
+    limiter = TokenBucket(rate, burst or rate)
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def get_stats():
+    """Return a copy of the request/throttled/retried/failed counters."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _retry_delay(exc, attempt):
+    headers = getattr(exc, 'headers', None) or {}
+    retry_after = headers.get('retry-after') if hasattr(headers, 'get') else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return min(30.0, 2 ** attempt) + random.uniform(0, 1)
+
+
+def call(fn, *args, **kwargs):
+    """Call a Notion endpoint under the shared rate limiter and concurrency cap.
+
+    429 and 5xx responses and transport errors are retried with exponential backoff,
+    honouring Retry-After; a 429 also pauses the limiter for every other caller.
+    """
+    return call_write(fn, None, *args, **kwargs)
+
+
+def call_write(fn, landed, *args, **kwargs):
+    """call() for a write that must not be applied twice, such as creating a page.
+
+    A 429 or a connection that never reached Notion is retried as usual. After a
+    timeout or 5xx the write may have been applied anyway, so landed() is asked first:
+    it returns the response the write would have had if it was applied (the retry is
+    then skipped), or None to send it again. landed=None makes it a plain call().
+    """
+    endpoint = getattr(fn, '__qualname__', getattr(fn, '__name__', 'call'))
+    start = time.time()
+    with instrumentation.timed("notion", endpoint=endpoint, retries=0) as event:
+        for attempt in range(MAX_RETRIES + 1):
+            limiter.acquire()
+            _count("requests")
+            try:
+                with notion_slots:
+                    return fn(*args, **kwargs)
+            except Exception as e:
+                status = getattr(e, 'status', None)
+                rate_limited = status == 429
+                transient = rate_limited or (isinstance(status, int) and status >= 500) \
+                    or type(e).__name__ in _TRANSIENT_ERRORS
+                if not transient or attempt == MAX_RETRIES:
+                    _count("failed")
+                    raise
+                if landed is not None and not rate_limited and type(e).__name__ not in _UNSENT_ERRORS:
+                    try:
+                        response = landed(start)
+                    except Exception:
+                        # Cannot tell whether the write was applied: fail rather than risk a duplicate
+                        _count("failed")
+                        raise e
+                    if response is not None:
+                        event["landed"] = True
+                        return response
+                delay = _retry_delay(e, attempt)
+                if rate_limited:
+                    _count("throttled")
+                    event["throttled"] = event.get("throttled", 0) + 1
+                    limiter.pause(delay)
+                _count("retried")
+                event["retries"] += 1
+                time.sleep(delay)
+
+
+class LazyClient:
+    """Stand-in for a client that is only built, by factory(), when first used."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        with self._lock:
+            if self._client is None:
+                self._client = self._factory()
+        return getattr(self._client, name)
+
+
+def _created_page(notion, request, since):
+    """The page a pages.create request made, found under its parent, or None."""
+    parent_id = request["parent"].get("page_id")
+    if not parent_id:
+        return None
+    title = "".join(item["text"]["content"] for item in request["properties"]["title"])
+    # created_time only has minute precision; the newest page with the title counts
+    minute = time.strftime("%Y-%m-%dT%H:%M", time.gmtime(since))
+    for block in reversed(notion_sync.list_children(notion, parent_id)):
+        if (block["type"] == "child_page" and block["child_page"]["title"] == title
+                and block.get("created_time", "")[:16] >= minute):
+            return notion.pages.retrieve(page_id=block["id"])
+    return None
+
+
+def _appended_children(notion, request, since):
+    """The blocks a blocks.children.append request added, if they are in place, or None."""
+    children = request["children"]
+    existing = notion_sync.list_children(notion, request["block_id"])
+    if request.get("after"):
+        ids = [block["id"] for block in existing]
+        if request["after"] not in ids:
+            return None
+        start = ids.index(request["after"]) + 1
+        candidates = existing[start:start + len(children)]
+    else:
+        candidates = existing[-len(children):] if children else []
+    signatures = [notion_sync.block_signature(block) for block in children]
+    if len(candidates) == len(children) and [notion_sync.block_signature(b) for b in candidates] == signatures:
+        return {"object": "list", "results": candidates}
+    return None
+
+
+# Endpoints that are not idempotent, with the check telling whether a failed request was applied
+_WRITE_CHECKS = {
+    "pages.create": _created_page,
+    "blocks.children.append": _appended_children,
+}
+
+
+class ThrottledClient:
+    """Proxy over a notion_client.Client routing every endpoint method through call().
+
+    `notion.pages.create(...)`, `notion.blocks.children.append(...)` etc. keep their
+    usual syntax, so all code sharing the proxy shares one limiter. Page creation and
+    block appends go through call_write() so an ambiguous failure never duplicates them.
+    """
+
+    def __init__(self, target, root=None, path=""):
+        self._target = target
+        self._root = root or self
+        self._path = path
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        path = f"{self._path}.{name}" if self._path else name
+        if callable(attr):
+            check = _WRITE_CHECKS.get(path)
+            if check is None:
+                return lambda *args, **kwargs: call(attr, *args, **kwargs)
+            return lambda **kwargs: call_write(attr, lambda since: check(self._root, kwargs, since), **kwargs)
+        return ThrottledClient(attr, self._root, path)
+
+
+def split_text_blocks(text, max_length=MAX_RICH_TEXT_LENGTH):
+    """Split text into chunks of max_length, breaking at newlines if possible."""
+    blocks = []
+    while len(text) > max_length:
+        split_at = text.rfind('\n', 0, max_length)
+        if split_at == -1 or split_at < max_length // 2:
+            split_at = max_length
+        blocks.append(text[:split_at])
+        text = text[split_at:]
+    if text:
+        blocks.append(text)
+    return blocks
+
+
+def rich_text(content, annotations=None, href=None):
+    """Build rich_text items for content, split into segments within the per-item length limit."""
+    items = []
+    for chunk in split_text_blocks(content):
+        item = {"type": "text", "text": {"content": chunk}}
+        if href:
+            item["text"]["link"] = {"url": href}
+        if annotations:
+            item["annotations"] = annotations
+        items.append(item)
+    return items
+
+
+def text_blocks(block_type, content, **extra):
+    """Build one block of block_type holding content, or several if it needs too many rich_text items."""
+    return rich_text_blocks(block_type, rich_text(content), **extra)
+
+
+def rich_text_blocks(block_type, items, **extra):
+    """Build one block of block_type from rich_text items, or several if there are too many items."""
+    if len(items) <= MAX_RICH_TEXT_ITEMS:
+        return [{"object": "block", "type": block_type, block_type: dict(extra, rich_text=items)}]
+    return [
+        {
+            "object": "block",
+            "type": block_type,
+            block_type: dict(extra, rich_text=items[i:i + MAX_RICH_TEXT_ITEMS]),
+        }
+        for i in range(0, len(items), MAX_RICH_TEXT_ITEMS)
+    ]
+
+
+def batch_children(children, size=MAX_CHILDREN_PER_REQUEST):
+    """Split a list of blocks into the largest batches a single request accepts."""
+    return [children[i:i + size] for i in range(0, len(children), size)]
+
+
+def append_children(notion, block_id, children):
+    """Append children to a block in as few legal-size requests as possible."""
+    for batch in batch_children(children):
+        notion.blocks.children.append(block_id=block_id, children=batch)
+
+
+def create_page(notion, parent_id, title, children=None, on_created=None):
+    """Create a page, sending the first batch of children with pages.create itself.
+
+    Remaining children are appended in batches of at most 100 blocks. on_created, if
+    given, is called with the new page ID before those remaining batches are sent.
+    """
+    batches = batch_children(children or [])
+    request = {
+        "parent": {"page_id": parent_id},
+        "properties": {"title": [{"type": "text", "text": {"content": title}}]},
+    }
+    if batches:
+        request["children"] = batches[0]
+    page = notion.pages.create(**request)
+    if on_created:
+        on_created(page["id"])
+    for batch in batches[1:]:
+        notion.blocks.children.append(block_id=page["id"], children=batch)
+    return page["id"]
+
+
+def write_streamed_page(notion, parent_id, title, chunks, converter, on_created=None, flush_blocks=None):
+    """Create a page from streamed text, appending blocks while the text is still being generated.
+
+    Every completed line is passed to converter.feed(text) -> blocks, and converter.close()
+    flushes whatever it still holds at the end (e.g. an unclosed code block). The page is created
+    with the first converted blocks, then pending blocks are appended whenever at least
+    flush_blocks (STREAM_FLUSH_BLOCKS) have accumulated. Returns (page_id, full_text).
+    """
+    flush_blocks = flush_blocks or int(os.getenv('STREAM_FLUSH_BLOCKS', '20'))
+    page_id = None
+    pending = []
+    parts = []
+    partial_line = ""
+    for chunk in chunks:
+        parts.append(chunk)
+        lines = (partial_line + chunk).split("\n")
+        partial_line = lines.pop()
+        if lines:
+            pending.extend(converter.feed("\n".join(lines)))
+        if pending and (page_id is None or len(pending) >= flush_blocks):
+            if page_id is None:
+                page_id = create_page(notion, parent_id, title, pending, on_created=on_created)
+            else:
+                append_children(notion, page_id, pending)
+            pending = []
+    if partial_line:
+        pending.extend(converter.feed(partial_line))
+    pending.extend(converter.close())
+    if page_id is None:
+        page_id = create_page(notion, parent_id, title, pending, on_created=on_created)
+    elif pending:
+        append_children(notion, page_id, pending)
+    return page_id, "".join(parts)
+
+
+def archive_page(notion, page_id):
+    """Move a page (and everything under it) to the trash."""
+    notion.pages.update(page_id=page_id, archived=True)
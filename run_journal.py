@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import threading
+from instrumentation import log
+
+
+class RunJournal:
+    """Per-project record of completed stages, their generated text and Notion page IDs.
+
+    The journal is a small JSON file that is rewritten atomically after every
+    update, so a rerun after a crash or API failure can skip finished stages
+    instead of regenerating content or creating duplicate pages.
+    """
+
+    def __init__(self, path, fingerprint):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stage_locks = {}
+        self._data = {"fingerprint": fingerprint, "stages": {}}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = None
+        if data and data.get("fingerprint") == fingerprint:
+            self._data = data
+        elif data:
+            log(f"⚠️ Design document changed since the last run, starting {os.path.basename(path)} over", level="warning")
+
+    def get(self, stage):
+        """Return a copy of the recorded fields of a stage (empty if it never ran)."""
+        with self._lock:
+            return dict(self._data["stages"].get(stage, {}))
+
+    def is_complete(self, stage):
+        return self.get(stage).get("complete", False)
+
+    def record(self, stage, **fields):
+        """Merge fields into a stage's record and persist the journal."""
+        with self._lock:
+            self._data["stages"].setdefault(stage, {}).update(fields)
+            self._save()
+
+    def forget_text(self, keep=("dataset",)):
+        """Drop the generated text of every stage except keep, but remember its page ID and block hash.
+
+        Used by sync runs: every page is generated again (unchanged prompts are served by
+        the LLM cache) and only the blocks that differ are sent to its existing page.
+        """
+        with self._lock:
+            for name, entry in self._data["stages"].items():
+                if name not in keep:
+                    entry.pop("text", None)
+                    entry.pop("complete", None)
+            self._save()
+
+    def stage_lock(self, stage):
+        """Lock serialising work on one stage, so concurrent callers never generate it twice."""
+        with self._lock:
+            return self._stage_locks.setdefault(stage, threading.Lock())
+
+    def completed_stages(self):
+        with self._lock:
+            return sorted(name for name, entry in self._data["stages"].items() if entry.get("complete"))
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+def journal_path(pdf_path, project_title, journal_dir=None):
+    """Location of the journal for a PDF: one file per source path, named after the project."""
+    journal_dir = journal_dir or os.getenv('RUN_JOURNAL_DIR', '.runs')
+    safe_title = "".join(c for c in project_title if c.isalnum() or c in (' ', '-', '_')).strip().replace(' ', '_')
+    path_hash = hashlib.sha1(os.path.abspath(pdf_path).encode('utf-8')).hexdigest()[:8]
+    return os.path.join(journal_dir, f"{safe_title or 'project'}-{path_hash}.json")
+
+
+def open_journal(pdf_path, project_title, document, restart=False):
+    """Open (or start) the journal of a project; restart discards any previous progress."""
+    path = journal_path(pdf_path, project_title)
+    if restart and os.path.exists(path):
+        os.remove(path)
+    fingerprint = hashlib.sha1(document["text"].encode('utf-8')).hexdigest()
+    return RunJournal(path, fingerprint)
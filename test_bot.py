@@ -0,0 +1,103 @@
+"""Offline tests of the per-project pipeline (bot) against the fake backends."""
+import os
+import pytest
+import bot
+import instrumentation
+from content_generator import parse_csv_chunk
+from job_queue import JobQueue, QUEUED
+from run_journal import RunJournal
+
+
+@pytest.fixture
+def run(fakes, design_pdf, monkeypatch):
+    """Run bot.main on the design PDF's folder with extra options; returns the events it recorded."""
+    monkeypatch.setattr(bot, "parent_page_id", "root")
+    for name in ("STREAM_SECTIONS", "SYNC_PAGES"):
+        monkeypatch.setattr(bot, name, getattr(bot, name))
+
+    def run(*options, exit_code=0):
+        instrumentation.reset()
+        assert bot.main([os.path.dirname(design_pdf), "--report", "report.json", *options]) == exit_code
+        return instrumentation.events()
+    return run
+
+
+def llm_calls(events, stage):
+    return [e for e in events if e["stage"] == stage and e["kind"] in ("gemini", "claude") and "context_cache" not in e]
+
+
+def test_streamed_project_plan_feeds_the_daily_batches(run):
+    events = run("--stream")
+    plan_calls = llm_calls(events, "section:project_plan")
+    assert [e.get("streamed", False) for e in plan_calls] == [True]
+    # The first batch of days was generated once the streamed plan was in
+    assert len(llm_calls(events, "day:1")) == 1
+
+
+def test_without_streaming_the_plan_is_generated_once(run):
+    assert [e.get("streamed", False) for e in llm_calls(run(), "section:project_plan")] == [False]
+
+
+def test_failed_streamed_plan_fails_the_project_instead_of_hanging(run, monkeypatch):
+    stream_section = bot.stream_section
+
+    def failing(section, document):
+        if section == "project_plan":
+            raise RuntimeError("stream broke")
+        return stream_section(section, document)
+
+    monkeypatch.setattr(bot, "stream_section", failing)
+    events = run("--stream", exit_code=1)
+    assert not any(e["stage"] == "day:1" for e in events)
+
+
+def test_dataset_header_line_reads_back_as_the_planned_columns(tmp_path, monkeypatch):
+    columns = ["id", "city, country", 'size "m2"', "notes"]
+    monkeypatch.setattr(bot, "plan_dataset", lambda document, project_title=None: {
+        "required": True, "headers": columns, "csv_path": "dataset.csv"})
+    journal = RunJournal(str(tmp_path / "journal.json"), "fingerprint")
+    line = bot.dataset_stage(journal, {"text": "design"}, "Demo")
+    assert parse_csv_chunk(line) == (columns, [])
+    assert journal.get("dataset")["headers"] == line
+
+
+def test_watch_job_is_settled_when_its_report_cannot_be_written(tmp_path, monkeypatch):
+    monkeypatch.setattr(bot, "_run_project", lambda path: {"title": "A", "run": 1, "error": None, "seconds": 0.1})
+
+    def unwritable(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(instrumentation, "write_report", unwritable)
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=2, retry_delay=0)
+    queue.enqueue(tmp_path / "a.pdf", "a")
+    bot._run_job(queue, queue.claim())
+    job = queue.get("a")
+    assert (job["status"], job["error"]) == (QUEUED, "disk full")
+    queue.close()
+
+
+def pages(fakes):
+    return [page for page in fakes.notion.pages_by_id.values() if not page["archived"]]
+
+
+def test_days_after_a_failed_batch_are_still_written(run, fakes, monkeypatch):
+    generate = bot.generate_daily_content_batch
+
+    def failing(first, last, **kwargs):
+        if first == 1:
+            raise RuntimeError("batch broke")
+        return generate(first, last, **kwargs)
+
+    monkeypatch.setattr(bot, "generate_daily_content_batch", failing)
+    run(exit_code=1)
+    titles = {page["title"] for page in pages(fakes)}
+    assert {f"Day {day}" for day in range(11, bot.DAYS + 1)} <= titles
+    assert not {f"Day {day}" for day in range(1, 11)} & titles
+
+
+def test_empty_streamed_section_is_not_journaled_as_complete(run, design_pdf, monkeypatch):
+    stream_section = bot.stream_section
+    monkeypatch.setattr(bot, "stream_section", lambda section, document:
+                        iter(["  \n"]) if section == "background" else stream_section(section, document))
+    run("--stream", exit_code=1)
+    assert "section:background" in bot.plan_project(design_pdf)["pending"]
@@ -0,0 +1,129 @@
+"""Offline tests of the parsing and validation of structured LLM responses (content_generator)."""
+import json
+import pytest
+import content_generator
+from content_generator import parse_daily_batch
+
+
+def days_json(*days):
+    return json.dumps([{"day": day, "content": f"Plan for day {day}"} for day in days])
+
+
+def test_daily_batch_keeps_every_valid_day():
+    assert parse_daily_batch(days_json(1, 2, 3), 1, 3) == {day: f"Plan for day {day}" for day in (1, 2, 3)}
+
+
+def test_daily_batch_reports_missing_days_by_leaving_them_out():
+    assert sorted(parse_daily_batch(days_json(1, 3), 1, 3)) == [1, 3]
+
+
+def test_daily_batch_drops_days_outside_the_range_and_repeats():
+    text = json.dumps([
+        {"day": 0, "content": "before"}, {"day": 2, "content": "first"}, {"day": 2, "content": "again"},
+        {"day": "3", "content": "as a string"}, {"day": 4, "content": "after"},
+    ])
+    assert parse_daily_batch(text, 1, 3) == {2: "first", 3: "as a string"}
+
+
+def test_daily_batch_drops_empty_or_malformed_items():
+    text = json.dumps([{"day": 1, "content": "  "}, {"day": 2}, "day 3", {"day": 3, "content": 42}])
+    assert parse_daily_batch(text, 1, 3) == {}
+
+
+@pytest.mark.parametrize("text", [
+    "```json\n" + days_json(1, 2) + "\n```",
+    json.dumps({"days": json.loads(days_json(1, 2))}),
+])
+def test_daily_batch_accepts_a_fenced_or_wrapped_array(text):
+    assert sorted(parse_daily_batch(text, 1, 2)) == [1, 2]
+
+
+@pytest.mark.parametrize("text", [None, "", "not json", "[{\"day\": 1,", "42"])
+def test_daily_batch_of_an_unusable_response_is_empty(text):
+    assert parse_daily_batch(text, 1, 3) == {}
+
+
+def test_days_missing_from_a_batch_fall_back_to_one_call_each(monkeypatch):
+    prompts = []
+
+    def generate_text(prompt, section, context=None, **params):
+        prompts.append(prompt)
+        if params.get("response_mime_type") == "application/json":
+            return days_json(1, 3, 7)
+        return "Single day plan"
+
+    monkeypatch.setattr(content_generator, "generate_text", generate_text)
+    days = content_generator.generate_daily_content_batch(1, 3, plan="Week 1: setup")
+    assert days == {1: "Plan for day 1", 2: "Single day plan", 3: "Plan for day 3"}
+    assert len(prompts) == 2
+    assert "Week 1: setup" in prompts[0]
+    assert "Day 2" in prompts[1]
+
+
+def test_a_day_that_cannot_be_generated_raises(monkeypatch):
+    monkeypatch.setattr(content_generator, "generate_text", lambda prompt, section, **params: "")
+    with pytest.raises(content_generator.GenerationError):
+        content_generator.generate_daily_content_batch(1, 2)
+
+
+def test_csv_chunk_takes_the_first_row_as_header_and_drops_fences():
+    text = "```csv\nid,name,notes\n1,Ada,\"likes, commas\"\n2,Bob,plain\n```"
+    assert content_generator.parse_csv_chunk(text) == (
+        ["id", "name", "notes"], [["1", "Ada", "likes, commas"], ["2", "Bob", "plain"]],
+    )
+
+
+def test_csv_chunk_drops_a_repeated_header_and_rows_of_the_wrong_width():
+    text = "id,name\n3,Cy\n id , name \n4\n5,Di,extra\n\n6,Ed"
+    assert content_generator.parse_csv_chunk(text, ["id", "name"]) == (["id", "name"], [["3", "Cy"], ["6", "Ed"]])
+
+
+def test_csv_chunk_without_rows():
+    assert content_generator.parse_csv_chunk("") == (None, [])
+    assert content_generator.parse_csv_chunk("```\n```", ["id"]) == (["id"], [])
+
+
+def generate_dataset_from(monkeypatch, tmp_path, chunks, **kwargs):
+    responses = iter(chunks)
+    prompts = []
+
+    def generate_text(prompt, section, context=None, **params):
+        prompts.append(prompt)
+        return next(responses)
+
+    monkeypatch.setattr(content_generator, "generate_text", generate_text)
+    path = str(tmp_path / "dataset.csv")
+    _, headers = content_generator.generate_dataset({"text": "design", "key": "doc"}, output_csv_path=path, **kwargs)
+    with open(path, encoding="utf-8") as f:
+        return headers, f.read().splitlines(), prompts
+
+
+def test_dataset_chunks_are_joined_without_repeated_headers_or_rows(monkeypatch, tmp_path):
+    headers, lines, prompts = generate_dataset_from(monkeypatch, tmp_path, [
+        "id,city\n1,Oslo\n2,Rome",
+        "id,city\n2,Rome\n3,\"Washington, D.C.\"",
+        "4,Lima\n5,Kyiv\n6,Pune",
+    ], rows=5, chunk_rows=2)
+    assert headers == ["id", "city"]
+    assert lines == ["id,city", "1,Oslo", "2,Rome", "3,\"Washington, D.C.\"", "4,Lima", "5,Kyiv"]
+    # Later chunks are asked for the rows still missing, continuing from the last ones written
+    assert "It already has 2 rows" in prompts[1] and "2,Rome" in prompts[1]
+    assert "next 2 rows" in prompts[2]
+
+
+def test_dataset_seeded_from_the_plan_starts_with_its_rows(monkeypatch, tmp_path):
+    headers, lines, prompts = generate_dataset_from(monkeypatch, tmp_path, ["3,c\n4,d"], rows=4, chunk_rows=2,
+                                                    headers=["id", "v"], first_rows=[["1", "a"], ["2", "b"]])
+    assert lines == ["id,v", "1,a", "2,b", "3,c", "4,d"]
+    assert len(prompts) == 1
+
+
+def test_dataset_stops_when_chunks_add_no_new_rows(monkeypatch, tmp_path):
+    _, lines, prompts = generate_dataset_from(monkeypatch, tmp_path, ["id\n1", "1", "id\n1", "2"], rows=10, chunk_rows=5)
+    assert lines == ["id", "1"]
+    assert len(prompts) == 1 + content_generator.DATASET_MAX_EMPTY_CHUNKS
+
+
+def test_dataset_without_a_usable_header_raises(monkeypatch, tmp_path):
+    with pytest.raises(ValueError):
+        generate_dataset_from(monkeypatch, tmp_path, ["id,id\n1,2"], rows=5)
@@ -0,0 +1,94 @@
+"""Offline tests of provider-side caching of the design document (see llm_providers.CONTEXT_CACHE)."""
+import os
+import pytest
+import bot
+import llm_providers
+from document_cache import load_document
+
+
+@pytest.fixture
+def parent_page(fakes, monkeypatch):
+    monkeypatch.setattr(bot, "parent_page_id", "root")
+    return "root"
+
+
+def test_gemini_caches_each_document_once_and_reuses_it(fakes, design_pdf, parent_page):
+    assert bot.main([os.path.dirname(design_pdf), "--report", "report.json"]) == 0
+    # Background, Work Overview, the dataset plan and the dataset's second chunk share one entry
+    assert fakes.calls["gemini_context_caches"] == 1
+    assert fakes.calls["gemini_context_reads"] == 4
+
+
+def test_claude_does_not_cache_a_document_it_sees_once(fakes, design_pdf, parent_page):
+    assert bot.main([os.path.dirname(design_pdf), "--report", "report.json"]) == 0
+    assert fakes.calls["claude"] == 1
+    assert fakes.calls.get("claude_context_caches", 0) == 0
+    assert fakes.calls.get("claude_context_reads", 0) == 0
+
+
+def test_claude_caches_a_document_from_its_second_call(fakes, design_pdf):
+    context = load_document(design_pdf)["text"]
+    model = llm_providers.model_for("engineering", provider="claude")
+    for prompt in ("first", "second", "third"):
+        llm_providers.generate_sync("claude", model, prompt, context=context)
+    assert fakes.calls["claude_context_caches"] == 1
+    assert fakes.calls["claude_context_reads"] == 1
+
+
+def test_short_or_disabled_contexts_are_sent_inline(fakes, design_pdf, monkeypatch):
+    model = llm_providers.model_for("background")
+    llm_providers.generate_sync("gemini", model, "prompt", context="too short to cache")
+    monkeypatch.setattr(llm_providers, "CONTEXT_CACHE", False)
+    llm_providers.generate_sync("gemini", model, "prompt", context=load_document(design_pdf)["text"])
+    assert fakes.calls.get("gemini_context_caches", 0) == 0
+    assert fakes.calls["gemini"] == 2
+
+
+class _GeminiError(Exception):
+    def __init__(self, code):
+        super().__init__(f"{code} from the cached model")
+        self.code = code
+
+
+class _FailingCachedModel:
+    def __init__(self, code):
+        self.code = code
+
+    async def generate_content_async(self, *args, **kwargs):
+        raise _GeminiError(self.code)
+
+
+def test_expired_gemini_cache_falls_back_to_the_inline_document(fakes, design_pdf, monkeypatch):
+    gemini = llm_providers.PROVIDERS["gemini"]
+    monkeypatch.setattr(gemini, "_create_context", lambda model, context: _FailingCachedModel(404))
+    context = load_document(design_pdf)["text"]
+    model = llm_providers.model_for("background")
+    assert llm_providers.generate_sync("gemini", model, "prompt", context=context)
+    assert fakes.calls["gemini"] == 1
+    assert gemini._context_key(model, context) not in gemini._contexts
+
+
+def test_other_errors_from_the_cached_model_are_not_resent_inline(fakes, design_pdf, monkeypatch):
+    gemini = llm_providers.PROVIDERS["gemini"]
+    monkeypatch.setattr(gemini, "_create_context", lambda model, context: _FailingCachedModel(400))
+    context = load_document(design_pdf)["text"]
+    with pytest.raises(llm_providers.LLMError):
+        llm_providers.generate_sync("gemini", llm_providers.model_for("background"), "prompt", context=context)
+    assert fakes.calls.get("gemini", 0) == 0
+    assert len(gemini._contexts) == 1
+
+
+def test_gemini_cache_entries_and_failures_are_dropped_after_the_ttl(fakes, design_pdf, monkeypatch):
+    gemini = llm_providers.PROVIDERS["gemini"]
+    attempts = []
+    monkeypatch.setattr(gemini, "_create_context", lambda model, context: attempts.append(model))
+    model = llm_providers.model_for("background")
+    for document in ("first", "second"):
+        llm_providers.generate_sync("gemini", model, "prompt", context=document * 5000)
+    llm_providers.generate_sync("gemini", model, "prompt", context="first" * 5000)
+    assert len(attempts) == 2
+    # Once the TTL has passed, every entry is stale
+    monkeypatch.setattr(llm_providers, "GEMINI_CACHE_TTL", 0)
+    llm_providers.generate_sync("gemini", model, "prompt", context="first" * 5000)
+    assert len(attempts) == 3
+    assert len(gemini._contexts) == 1
@@ -0,0 +1,19 @@
+"""Offline tests of wiring the fake backends in and out (fake_backends.install)."""
+import random
+import fake_backends
+import llm_providers
+
+
+def test_installing_the_fakes_again_does_not_compound_the_backoff_scale(fakes):
+    random.seed(0)
+    first = llm_providers.backoff_delay(llm_providers.RATE_LIMIT, 3)
+    fake_backends.install(fakes)
+    random.seed(0)
+    assert llm_providers.backoff_delay(llm_providers.RATE_LIMIT, 3) == first
+    assert 0 < first <= 60.0 * 0.01
+
+
+def test_the_real_clients_are_back_after_a_test_with_fakes():
+    assert not isinstance(llm_providers.PROVIDERS["claude"]._client, fake_backends.FakeAsyncAnthropic)
+    assert not isinstance(llm_providers.genai, fake_backends.FakeGenAI)
+    assert llm_providers.backoff_delay.__module__ == "llm_providers"
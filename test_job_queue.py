@@ -0,0 +1,111 @@
+"""Offline tests of the durable watch-mode job queue (job_queue)."""
+import pytest
+from job_queue import DONE, FAILED, QUEUED, RUNNING, SUPERSEDED, JobQueue, file_hash
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=2, retry_delay=0)
+    yield queue
+    queue.close()
+
+
+def test_same_content_is_queued_once(queue, tmp_path):
+    assert queue.enqueue(tmp_path / "a.pdf", "hash-a", title="A")
+    assert not queue.enqueue(tmp_path / "copy of a.pdf", "hash-a", title="A")
+    assert queue.counts() == {QUEUED: 1}
+
+
+def test_changed_file_supersedes_its_queued_version(queue, tmp_path):
+    queue.enqueue(tmp_path / "a.pdf", "v1")
+    queue.enqueue(tmp_path / "a.pdf", "v2")
+    assert queue.get("v1")["status"] == SUPERSEDED
+    assert queue.claim()["hash"] == "v2"
+    assert queue.claim() is None
+
+
+def test_claim_takes_the_oldest_job_and_marks_it_running(queue, tmp_path):
+    queue.enqueue(tmp_path / "a.pdf", "first")
+    queue.enqueue(tmp_path / "b.pdf", "second")
+    job = queue.claim()
+    assert (job["hash"], job["status"], job["attempts"]) == ("first", RUNNING, 1)
+    assert queue.claim()["hash"] == "second"
+    assert queue.claim() is None
+
+
+def test_new_version_waits_while_the_old_one_runs(queue, tmp_path):
+    queue.enqueue(tmp_path / "a.pdf", "v1")
+    queue.enqueue(tmp_path / "b.pdf", "other")
+    assert queue.claim()["hash"] == "v1"
+    queue.enqueue(tmp_path / "a.pdf", "v2")
+    assert queue.claim()["hash"] == "other"
+    assert queue.claim() is None
+    queue.finish("v1")
+    assert queue.claim()["hash"] == "v2"
+
+
+def test_success_is_recorded(queue, tmp_path):
+    queue.enqueue(tmp_path / "a.pdf", "a")
+    queue.claim()
+    assert queue.finish("a", seconds=1.5, report="report.json") == DONE
+    job = queue.get("a")
+    assert (job["status"], job["seconds"], job["report"], job["error"]) == (DONE, 1.5, "report.json", None)
+
+
+def test_failure_is_retried_until_attempts_run_out(queue, tmp_path):
+    queue.enqueue(tmp_path / "a.pdf", "a")
+    queue.claim()
+    assert queue.finish("a", error="Notion 502") == QUEUED
+    job = queue.claim()
+    assert job["attempts"] == 2 and job["error"] is None
+    assert queue.finish("a", error="Notion 502 again") == FAILED
+    assert queue.get("a")["error"] == "Notion 502 again"
+    assert queue.claim() is None
+
+
+def test_failed_job_waits_for_its_retry_delay(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=3, retry_delay=60)
+    queue.enqueue(tmp_path / "a.pdf", "a")
+    queue.claim()
+    assert queue.finish("a", error="boom") == QUEUED
+    assert queue.claim() is None
+    assert queue.get("a")["available_at"] >= queue.get("a")["finished_at"] + 60
+    queue.close()
+
+
+def test_job_left_running_by_a_stopped_watcher_is_recovered(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    crashed = JobQueue(path)
+    crashed.enqueue(tmp_path / "a.pdf", "a")
+    assert crashed.claim()["status"] == RUNNING
+    crashed.close()
+
+    queue = JobQueue(path)
+    assert queue.claim() is None
+    assert queue.recover() == 1
+    job = queue.claim()
+    assert (job["hash"], job["attempts"]) == ("a", 2)
+    assert queue.recover() == 1
+    queue.close()
+
+
+def test_history_survives_a_restart(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    queue = JobQueue(path)
+    queue.enqueue(tmp_path / "a.pdf", "a", title="A")
+    queue.claim()
+    queue.finish("a")
+    queue.enqueue(tmp_path / "b.pdf", "b", title="B")
+    queue.close()
+
+    reopened = JobQueue(path)
+    assert reopened.counts() == {DONE: 1, QUEUED: 1}
+    assert [job["title"] for job in reopened.recent()] == ["B", "A"]
+    reopened.close()
+
+
+def test_file_hash_depends_on_content_only(tmp_path):
+    (tmp_path / "a.pdf").write_bytes(b"same")
+    (tmp_path / "b.pdf").write_bytes(b"same")
+    (tmp_path / "c.pdf").write_bytes(b"different")
+    assert file_hash(tmp_path / "a.pdf") == file_hash(tmp_path / "b.pdf") != file_hash(tmp_path / "c.pdf")
@@ -0,0 +1,112 @@
+"""Offline tests of the Markdown-to-Notion conversion (markdown_converter) and streamed page writing."""
+import pytest
+from markdown_converter import MarkdownConverter, markdown_to_notion_blocks
+from notion_writer import MAX_RICH_TEXT_ITEMS, MAX_RICH_TEXT_LENGTH, ThrottledClient, write_streamed_page
+
+DOCUMENT = """# Architecture
+Intro with **bold**, *italic*, `code` and a [link](https://example.com).
+## Components
+- Frontend (React)
+- Backend **API**
+1. Collect the data
+2. Train the model
+```mermaid
+graph TD
+  A --> B
+
+  B --> C
+```
+**Risks**
+Closing paragraph.
+"""
+
+
+def texts(blocks):
+    return [(b["type"], "".join(item["text"]["content"] for item in b[b["type"]]["rich_text"])) for b in blocks]
+
+
+def test_block_types_and_annotations():
+    blocks = markdown_to_notion_blocks(DOCUMENT)
+    assert [b["type"] for b in blocks] == [
+        "heading_1", "paragraph", "heading_2", "bulleted_list_item", "bulleted_list_item",
+        "numbered_list_item", "numbered_list_item", "code", "heading_3", "paragraph",
+    ]
+    intro = blocks[1]["paragraph"]["rich_text"]
+    assert [item.get("annotations") for item in intro if item.get("annotations")] == [
+        {"bold": True}, {"italic": True}, {"code": True},
+    ]
+    assert intro[-2]["text"]["link"] == {"url": "https://example.com"}
+    assert blocks[7]["code"]["language"] == "mermaid"
+    assert texts(blocks)[7][1] == "graph TD\n  A --> B\n\n  B --> C"
+
+
+@pytest.mark.parametrize("lines_per_feed", [1, 2, 5])
+def test_feeding_complete_lines_matches_a_single_pass(lines_per_feed):
+    lines = DOCUMENT.splitlines()
+    converter = MarkdownConverter()
+    blocks = []
+    for i in range(0, len(lines), lines_per_feed):
+        blocks += converter.feed("\n".join(lines[i:i + lines_per_feed]))
+    blocks += converter.close()
+    assert blocks == markdown_to_notion_blocks(DOCUMENT)
+
+
+def test_code_block_is_held_back_until_its_fence_closes():
+    converter = MarkdownConverter()
+    assert converter.feed("```python\nprint(1)") == []
+    assert converter.feed("print(2)") == []
+    blocks = converter.feed("```\nafter")
+    assert texts(blocks) == [("code", "print(1)\nprint(2)"), ("paragraph", "after")]
+
+
+def test_blank_lines_inside_a_code_block_survive_line_by_line_feeding():
+    converter = MarkdownConverter()
+    blocks = []
+    for line in ["```", "a = 1", "", "b = 2", "```"]:
+        blocks += converter.feed(line)
+    assert texts(blocks) == [("code", "a = 1\n\nb = 2")]
+
+
+def test_close_flushes_an_unclosed_code_block():
+    converter = MarkdownConverter()
+    converter.feed("```\nline one\nline two")
+    assert texts(converter.close()) == [("code", "line one\nline two")]
+    assert converter.close() == []
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64])
+def test_streamed_page_matches_a_single_pass_whatever_the_chunk_boundaries(fakes, chunk_size):
+    chunks = [DOCUMENT[i:i + chunk_size] for i in range(0, len(DOCUMENT), chunk_size)]
+    page_id, text = write_streamed_page(ThrottledClient(fakes.notion), "root", "Streamed", iter(chunks),
+                                        MarkdownConverter(), flush_blocks=3)
+    assert text == DOCUMENT
+    assert texts(fakes.notion.children[page_id]) == texts(markdown_to_notion_blocks(DOCUMENT))
+
+
+def test_long_text_is_split_into_items_within_the_length_limit():
+    paragraph = "word " * 1000
+    blocks = markdown_to_notion_blocks(paragraph)
+    items = blocks[0]["paragraph"]["rich_text"]
+    assert len(blocks) == 1
+    assert len(items) == 3
+    assert all(len(item["text"]["content"]) <= MAX_RICH_TEXT_LENGTH for item in items)
+    assert "".join(item["text"]["content"] for item in items) == paragraph.strip()
+
+
+def test_long_code_block_is_split_within_the_length_limit():
+    code = "\n".join(f"line {i} " + "x" * 50 for i in range(100))
+    blocks = markdown_to_notion_blocks(f"```python\n{code}\n```")
+    assert [b["type"] for b in blocks] == ["code"]
+    assert blocks[0]["code"]["language"] == "python"
+    assert all(len(item["text"]["content"]) <= MAX_RICH_TEXT_LENGTH for item in blocks[0]["code"]["rich_text"])
+    assert texts(blocks)[0][1] == code
+
+
+def test_too_many_rich_text_items_are_spread_over_several_blocks():
+    line = " ".join(f"**b{i}** plain" for i in range(120))
+    blocks = markdown_to_notion_blocks(line)
+    assert len(blocks) == 3
+    assert all(b["type"] == "paragraph" for b in blocks)
+    assert all(len(b["paragraph"]["rich_text"]) <= MAX_RICH_TEXT_ITEMS for b in blocks)
+    assert "".join(item["text"]["content"] for b in blocks for item in b["paragraph"]["rich_text"]) == \
+        line.replace("**", "")
@@ -0,0 +1,113 @@
+"""Offline tests of updating existing pages by block diff (notion_sync)."""
+import os
+import random
+import pytest
+import bot
+import notion_sync
+from notion_writer import ThrottledClient, create_page, text_blocks
+
+
+def paragraphs(*contents):
+    return [block for content in contents for block in text_blocks("paragraph", content)]
+
+
+def page_texts(notion, page_id):
+    return [(b["type"], b[b["type"]].get("title") or "".join(i["text"]["content"] for i in b[b["type"]]["rich_text"]))
+            for b in notion.children[page_id]]
+
+
+def page_texts_of(blocks):
+    return [(b["type"], "".join(i["text"]["content"] for i in b[b["type"]]["rich_text"])) for b in blocks]
+
+
+@pytest.fixture
+def client(fakes):
+    return ThrottledClient(fakes.notion)
+
+
+def requests(fakes):
+    return fakes.calls.get("notion", 0)
+
+
+def test_unchanged_page_is_only_listed(fakes, client):
+    blocks = paragraphs("one", "two", "three")
+    page_id = create_page(client, "root", "Page", blocks)
+    before = requests(fakes)
+    assert notion_sync.sync_blocks(client, page_id, paragraphs("one", "two", "three")) == \
+        {"updated": 0, "deleted": 0, "inserted": 0}
+    assert requests(fakes) - before == 1
+
+
+def test_changed_block_is_updated_in_place(fakes, client):
+    page_id = create_page(client, "root", "Page", paragraphs("one", "two", "three"))
+    first_ids = [b["id"] for b in fakes.notion.children[page_id]]
+    before = requests(fakes)
+    changes = notion_sync.sync_blocks(client, page_id, paragraphs("one", "TWO", "three"))
+    assert changes == {"updated": 1, "deleted": 0, "inserted": 0}
+    assert requests(fakes) - before == 2
+    assert [b["id"] for b in fakes.notion.children[page_id]] == first_ids
+    assert page_texts(fakes.notion, page_id) == page_texts_of(paragraphs("one", "TWO", "three"))
+
+
+def test_inserted_blocks_land_after_the_right_block(fakes, client):
+    page_id = create_page(client, "root", "Page", paragraphs("a", "b", "c"))
+    changes = notion_sync.sync_blocks(client, page_id, paragraphs("a", "x", "y", "b", "c", "z"))
+    assert changes == {"updated": 0, "deleted": 0, "inserted": 3}
+    assert page_texts(fakes.notion, page_id) == page_texts_of(paragraphs("a", "x", "y", "b", "c", "z"))
+
+
+def test_blocks_inserted_at_the_top_stay_ahead_of_child_pages(fakes, client):
+    page_id = create_page(client, "root", "Plan", paragraphs("b", "c"))
+    create_page(client, page_id, "Day 1")
+    notion_sync.sync_blocks(client, page_id, text_blocks("heading_1", "a") + paragraphs("b", "c"))
+    assert page_texts(fakes.notion, page_id) == \
+        page_texts_of(text_blocks("heading_1", "a") + paragraphs("b", "c")) + [("child_page", "Day 1")]
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_random_edits_produce_the_new_content(fakes, client, seed):
+    rng = random.Random(seed)
+    words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta"]
+
+    def random_blocks(least):
+        return [block for _ in range(rng.randint(least, 8))
+                for block in text_blocks(rng.choice(["paragraph", "heading_2", "bulleted_list_item"]),
+                                         rng.choice(words))]
+
+    # Notion can only insert after an existing block, so the page starts with at least one
+    old, new = random_blocks(1), random_blocks(0)
+    page_id = create_page(client, "root", "Page", old)
+    create_page(client, page_id, "Child")
+    notion_sync.sync_blocks(client, page_id, new)
+    assert page_texts(fakes.notion, page_id) == page_texts_of(new) + [("child_page", "Child")]
+
+
+def test_child_page_is_found_by_title(fakes, client):
+    parent = create_page(client, "root", "Project")
+    section = create_page(client, parent, "Background Information")
+    assert notion_sync.find_child_page(client, parent, "Background Information") == section
+    assert notion_sync.find_child_page(client, parent, "Missing") is None
+    notion_sync.remember_child_page(parent, "Work Overview", "page-id")
+    assert notion_sync.find_child_page(client, parent, "Work Overview") == "page-id"
+
+
+def test_blocks_hash_ignores_how_rich_text_was_split():
+    whole = [{"type": "paragraph", "paragraph": {"rich_text": [{"type": "text", "text": {"content": "ab"}}]}}]
+    split = [{"type": "paragraph", "paragraph": {"rich_text": [
+        {"type": "text", "text": {"content": "a"}, "annotations": {"bold": False, "color": "default"}},
+        {"type": "text", "text": {"content": "b"}, "plain_text": "b"},
+    ]}, "id": "block-id"}]
+    assert notion_sync.blocks_hash(whole) == notion_sync.blocks_hash(split)
+    assert notion_sync.blocks_hash(whole) != notion_sync.blocks_hash(paragraphs("ba"))
+
+
+def test_unchanged_rerun_with_sync_makes_no_notion_calls(fakes, design_pdf, monkeypatch):
+    monkeypatch.setattr(bot, "parent_page_id", "root")
+    monkeypatch.setattr(bot, "SYNC_PAGES", False)
+    folder = os.path.dirname(design_pdf)
+    assert bot.main([folder, "--report", "report.json"]) == 0
+    pages = len(fakes.notion.pages_by_id)
+    before = requests(fakes)
+    assert bot.main([folder, "--sync", "--report", "report.json"]) == 0
+    assert requests(fakes) == before
+    assert len(fakes.notion.pages_by_id) == pages
@@ -0,0 +1,184 @@
+"""Offline tests of the Notion rate limiter, retries and request-size limits (notion_writer)."""
+import pytest
+import fake_backends
+import notion_writer
+from notion_writer import ThrottledClient, create_page, text_blocks
+
+
+class ReadTimeout(Exception):
+    """Named like httpx's, so call() classifies it as a transport error."""
+
+
+class ConnectError(Exception):
+    pass
+
+
+def fail_once(notion, endpoint, error, applied):
+    """Make the next `endpoint` request raise error, after applying it if `applied`."""
+    real = notion._request
+    state = {"failed": False}
+
+    def request(name, handler, *args):
+        if name != endpoint or state["failed"]:
+            return real(name, handler, *args)
+        state["failed"] = True
+        if applied:
+            real(name, handler, *args)
+        raise error
+
+    notion._request = request
+
+
+@pytest.fixture
+def notion(fakes, monkeypatch):
+    monkeypatch.setattr(notion_writer, "_retry_delay", lambda exc, attempt: 0)
+    return fakes.notion
+
+
+def pages_titled(notion, title):
+    return [p for p in notion.pages_by_id.values() if p["title"] == title and not p["archived"]]
+
+
+@pytest.mark.parametrize("error", [fake_backends.APIResponseError(502, "Bad gateway"), ReadTimeout("timed out")])
+def test_create_applied_before_an_ambiguous_failure_is_not_repeated(notion, error):
+    fail_once(notion, "pages.create", error, applied=True)
+    page_id = create_page(ThrottledClient(notion), "root", "Day 1", text_blocks("paragraph", "hello"))
+    assert [p["id"] for p in pages_titled(notion, "Day 1")] == [page_id]
+    assert len(notion.children[page_id]) == 1
+
+
+def test_create_not_applied_before_a_timeout_is_retried(notion):
+    fail_once(notion, "pages.create", ReadTimeout("timed out"), applied=False)
+    page_id = create_page(ThrottledClient(notion), "root", "Day 1")
+    assert [p["id"] for p in pages_titled(notion, "Day 1")] == [page_id]
+
+
+def test_append_applied_before_a_5xx_is_not_repeated(notion):
+    client = ThrottledClient(notion)
+    page_id = create_page(client, "root", "Page", text_blocks("paragraph", "first"))
+    fail_once(notion, "blocks.children.append", fake_backends.APIResponseError(503, "Unavailable"), applied=True)
+    response = client.blocks.children.append(block_id=page_id, children=text_blocks("paragraph", "second"))
+    contents = [b["paragraph"]["rich_text"][0]["text"]["content"] for b in notion.children[page_id]]
+    assert contents == ["first", "second"]
+    assert response["results"][0]["id"] == notion.children[page_id][1]["id"]
+
+
+def test_writes_that_never_reached_notion_are_retried_without_a_check(notion):
+    fail_once(notion, "pages.create", ConnectError("refused"), applied=False)
+    before = notion_writer.get_stats()["requests"]
+    create_page(ThrottledClient(notion), "root", "Day 1")
+    assert len(pages_titled(notion, "Day 1")) == 1
+    # pages.create twice and no listing of the parent to look for the page
+    assert notion_writer.get_stats()["requests"] - before == 2
+
+
+def test_a_failure_that_is_not_transient_is_raised(notion):
+    fail_once(notion, "pages.create", fake_backends.APIResponseError(400, "validation_error"), applied=False)
+    with pytest.raises(fake_backends.APIResponseError):
+        create_page(ThrottledClient(notion), "root", "Day 1")
+    assert pages_titled(notion, "Day 1") == []
+
+
+class Clock:
+    """Stand-in for the time module: sleeping advances the clock instantly."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(round(seconds, 3))
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(notion_writer, "time", clock)
+    return clock
+
+
+def test_token_bucket_allows_a_burst_then_the_rate(clock):
+    bucket = notion_writer.TokenBucket(rate=2, capacity=3)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.slept == []
+    bucket.acquire()
+    assert clock.slept == [0.5]
+
+
+def test_token_bucket_pause_holds_back_every_caller(clock):
+    bucket = notion_writer.TokenBucket(rate=10, capacity=10)
+    bucket.pause(4)
+    bucket.acquire()
+    assert clock.now - 1000.0 >= 4
+
+
+def flaky(*errors, result="ok"):
+    """An endpoint raising each of errors in turn, then returning result."""
+    remaining = list(errors)
+
+    def endpoint(**kwargs):
+        if remaining:
+            raise remaining.pop(0)
+        return result
+    return endpoint
+
+
+@pytest.fixture
+def fast_limiter(clock, monkeypatch):
+    monkeypatch.setattr(notion_writer, "limiter", notion_writer.TokenBucket(1000, 1000))
+    return clock
+
+
+@pytest.mark.parametrize("error", [
+    fake_backends.APIResponseError(502, "Bad gateway"),
+    fake_backends.APIResponseError(500, "Internal error"),
+    ReadTimeout("timed out"),
+    ConnectError("refused"),
+])
+def test_transient_errors_are_retried(fast_limiter, error):
+    before = notion_writer.get_stats()
+    assert notion_writer.call(flaky(error)) == "ok"
+    after = notion_writer.get_stats()
+    assert (after["requests"] - before["requests"], after["retried"] - before["retried"]) == (2, 1)
+
+
+def test_rate_limited_request_honours_retry_after_and_pauses_the_limiter(fast_limiter):
+    before = notion_writer.get_stats()["throttled"]
+    assert notion_writer.call(flaky(fake_backends.APIResponseError(429, "slow down", retry_after=7))) == "ok"
+    assert notion_writer.get_stats()["throttled"] - before == 1
+    assert 7 in fast_limiter.slept
+    assert notion_writer.limiter._paused_until >= 1007
+
+
+@pytest.mark.parametrize("status", [400, 401, 404, 409])
+def test_client_errors_are_not_retried(fast_limiter, status):
+    endpoint = flaky(fake_backends.APIResponseError(status, "no"))
+    with pytest.raises(fake_backends.APIResponseError):
+        notion_writer.call(endpoint)
+    assert endpoint() == "ok"
+
+
+def test_retries_give_up_after_max_retries(fast_limiter, monkeypatch):
+    monkeypatch.setattr(notion_writer, "MAX_RETRIES", 2)
+    errors = [fake_backends.APIResponseError(503, f"attempt {i}") for i in range(3)]
+    with pytest.raises(fake_backends.APIResponseError, match="attempt 2"):
+        notion_writer.call(flaky(*errors))
+
+
+def test_page_is_created_with_its_first_hundred_blocks_and_the_rest_appended(notion):
+    blocks = [block for i in range(250) for block in text_blocks("paragraph", f"block {i}")]
+    created = []
+    before = notion_writer.get_stats()["requests"]
+    page_id = create_page(ThrottledClient(notion), "root", "Long", blocks, on_created=created.append)
+    assert notion_writer.get_stats()["requests"] - before == 3
+    assert created == [page_id]
+    assert [b["paragraph"]["rich_text"][0]["text"]["content"] for b in notion.children[page_id]] == \
+        [f"block {i}" for i in range(250)]